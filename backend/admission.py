@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import itertools
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from rate_limit import MemoryBuckets, SqliteBuckets
+
+# Global upstream budget, sized to the provider's rate limit tier (0, the default, disables it)
+UPSTREAM_RATE_PER_MINUTE = float(os.getenv("UPSTREAM_RATE_PER_MINUTE", "0"))
+UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", "10"))
+
+# Per-client quota on requests that need an upstream call (0, the default, disables it).
+# Clients are told apart by CLIENT_ID_HEADER or their IP, so behind a proxy that does
+# not forward client IPs every user shares one quota
+CLIENT_RATE_PER_MINUTE = float(os.getenv("CLIENT_RATE_PER_MINUTE", "0"))
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "5"))
+
+# Longest a request may queue for the global budget before getting a 429
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "5"))  # seconds
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+
+# Request header identifying a client (e.g. an API key); unset or absent uses the client IP
+CLIENT_ID_HEADER = os.getenv("CLIENT_ID_HEADER", "")
+
+# SQLite file shared by all workers so they enforce one budget (empty keeps it per worker)
+BUDGET_DB = os.getenv("BUDGET_DB", "")
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class BudgetExceeded(Exception):
+    """Raised when a request may not call the upstream now"""
+
+    def __init__(self, retry_after: float, scope: str):
+        super().__init__(f"Upstream budget exceeded ({scope}), retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class AdmissionController:
+    """Admission control in front of upstream calls.
+
+    Every client has its own quota, checked without waiting. Requests within it
+    then take a token from the global bucket; when it is empty they queue by
+    priority for at most ``max_wait`` seconds, counting only the queued requests
+    that go before them. Requests that would wait longer, or find the queue full,
+    are rejected at once so callers can answer 429 with Retry-After. The client's
+    quota is only charged once the global budget admits the request.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = UPSTREAM_RATE_PER_MINUTE,
+        burst: float = UPSTREAM_BURST,
+        client_rate_per_minute: float = CLIENT_RATE_PER_MINUTE,
+        client_burst: float = CLIENT_BURST,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        buckets: Optional[Union[MemoryBuckets, SqliteBuckets]] = None,
+    ):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.client_rate = client_rate_per_minute / 60
+        self.client_burst = client_burst
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.buckets = buckets or (SqliteBuckets(BUDGET_DB) if BUDGET_DB else MemoryBuckets())
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"client": 0, "global": 0, "timeout": 0}
+
+    async def admit(self, client: str = "", priority: int = PRIORITY_INTERACTIVE, bounded: bool = True) -> None:
+        """Admit one upstream call for a client, or raise BudgetExceeded.
+
+        Unbounded callers (batches) wait for the client's quota to refill instead of
+        being rejected, as they wait for the global budget.
+        """
+        while True:
+            wait = self._client_wait(client)
+            if not wait:
+                break
+            if bounded:
+                self.rejected["client"] += 1
+                raise BudgetExceeded(wait, "client")
+            await asyncio.sleep(wait)
+        await self.acquire(priority, bounded)
+        # Charged only now, so requests the global budget rejects cost the client nothing
+        while True:
+            wait = self._try_client(client)
+            if not wait:
+                return
+            if bounded:
+                self.rejected["client"] += 1
+                raise BudgetExceeded(wait, "client")
+            await asyncio.sleep(wait)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, bounded: bool = True) -> None:
+        """Take a global upstream token, queueing for it by priority.
+
+        Unbounded callers (batches, which already stream results as they finish) wait
+        as long as it takes instead of being rejected after max_wait.
+        """
+        if self.rate <= 0:
+            return
+        max_wait = self.max_wait if bounded else None
+        if not self._queue:
+            wait = self._try_global()
+            if wait == 0:
+                self.admitted += 1
+                return
+        else:
+            wait = 1 / self.rate
+        estimate = wait + self._ahead_of(priority) / self.rate
+        if len(self._queue) >= self.max_queue or (max_wait is not None and estimate > max_wait):
+            self.rejected["global"] += 1
+            raise BudgetExceeded(estimate, "global")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        try:
+            # A timed-out future is cancelled, and the dispatcher skips it
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            raise BudgetExceeded((self._ahead_of(priority) + 1) / self.rate, "global")
+
+    def _ahead_of(self, priority: int) -> int:
+        """Queued requests admitted before a new one of this priority (lower-priority ones are not)"""
+        return sum(1 for queued, _, future in self._queue if queued <= priority and not future.done())
+
+    def _try_client(self, client: str) -> float:
+        if not client or self.client_rate <= 0:
+            return 0.0
+        return self.buckets.try_acquire(f"client:{client}", self.client_rate, self.client_burst)
+
+    def _client_wait(self, client: str) -> float:
+        if not client or self.client_rate <= 0:
+            return 0.0
+        return self.buckets.wait_time(f"client:{client}", self.client_rate, self.client_burst)
+
+    def _try_global(self) -> float:
+        return self.buckets.try_acquire("global", self.rate, self.burst)
+
+    async def _dispatch(self) -> None:
+        """Hand global tokens to queued requests as the bucket refills"""
+        while self._queue:
+            if self._queue[0][2].done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._try_global()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._queue)
+            future.set_result(None)
+            self.admitted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "queueDepth": sum(1 for _, _, future in self._queue if not future.done()),
+            "shared": isinstance(self.buckets, SqliteBuckets),
+        }
+
+    def close(self) -> None:
+        self.buckets.close()
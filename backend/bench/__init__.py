@@ -0,0 +1 @@
+"""Local stub upstream and benchmark scripts for the LearnFlow backend"""
@@ -0,0 +1,69 @@
+"""Show per-client quotas keeping a noisy client from starving the others.
+
+One noisy client sends a request every 50 ms while four polite clients send one
+every 2 s, all against a global budget smaller than the noisy client's rate.
+Reports admitted and rejected requests per kind of client, with and without the
+per-client quota, and the admission wait of admitted requests.
+
+Usage (from the backend directory):
+    python -m bench.bench_admission [seconds]
+"""
+import asyncio
+import sys
+import time
+
+from admission import AdmissionController, BudgetExceeded
+
+GLOBAL_RATE = 600  # per minute
+GLOBAL_BURST = 5
+CLIENT_RATE = 120  # per minute
+CLIENT_BURST = 3
+POLITE_CLIENTS = 4
+
+
+async def client(controller: AdmissionController, name: str, interval: float, deadline: float, results: dict):
+    stats = results.setdefault(name.split("-")[0], {"admitted": 0, "rejected": 0, "waits": []})
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            await controller.admit(name)
+            stats["admitted"] += 1
+            stats["waits"].append(time.perf_counter() - start)
+        except BudgetExceeded:
+            stats["rejected"] += 1
+        await asyncio.sleep(interval)
+
+
+async def run(seconds: float, client_rate: float) -> None:
+    controller = AdmissionController(
+        rate_per_minute=GLOBAL_RATE,
+        burst=GLOBAL_BURST,
+        client_rate_per_minute=client_rate,
+        client_burst=CLIENT_BURST,
+        max_wait=1,
+    )
+    results: dict = {}
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(
+        client(controller, "noisy", 0.05, deadline, results),
+        *(client(controller, f"polite-{i}", 2, deadline, results) for i in range(POLITE_CLIENTS)),
+    )
+    label = f"client quota {client_rate:.0f}/min" if client_rate else "no client quota"
+    print(label)
+    for name, stats in sorted(results.items()):
+        waits = sorted(stats["waits"]) or [0.0]
+        print(
+            f"  {name:7} admitted {stats['admitted']:4d}  rejected {stats['rejected']:4d}  "
+            f"wait p50 {waits[len(waits) // 2] * 1000:6.1f} ms  max {waits[-1] * 1000:6.1f} ms"
+        )
+    controller.close()
+
+
+async def main(seconds: float) -> None:
+    print(f"global budget {GLOBAL_RATE}/min, {seconds:.0f}s per run")
+    await run(seconds, 0)
+    await run(seconds, CLIENT_RATE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,70 @@
+"""Run a cohort batch through /api/generate-plans against the fake Sonar server.
+
+Usage (from the backend directory):
+    python -m bench.bench_batch [items] [unique]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from bench.fake_sonar import BackgroundServer, FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+os.environ.setdefault("BATCH_MAX_CONCURRENCY", "8")
+os.environ.setdefault("BATCH_RATE_PER_SECOND", "20")
+
+LEVELS = ["beginner", "intermediate", "advanced"]
+
+
+def cohort(items: int, unique: int) -> list:
+    """Build a batch with duplicates, one upstream failure and one invalid item"""
+    batch = [
+        {
+            "topic": f"Topic {i % unique}" if i != 1 else "FAIL topic",
+            "timeframe": 4,
+            "timeframeUnit": "weeks",
+            "knowledgeLevel": LEVELS[i % len(LEVELS)],
+            "preferences": ["video", "text"],
+            "studyTimePerDay": 2,
+        }
+        for i in range(items)
+    ]
+    batch[2] = {"topic": "Missing fields"}
+    return batch
+
+
+async def run(items: int, unique: int) -> None:
+    import httpx
+
+    with FakeSonarServer() as server:
+        server.app.state.latency = 0.2
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        with BackgroundServer(main.app, port=8766) as backend:
+            async with httpx.AsyncClient(base_url=backend.base_url, timeout=300) as client:
+                events = {"plan": 0, "error": 0, "done": 0}
+                first = None
+                start = time.perf_counter()
+                async with client.stream("POST", "/api/generate-plans", json=cohort(items, unique)) as response:
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        events[event["event"]] += 1
+                        if first is None and event["event"] == "plan":
+                            first = time.perf_counter() - start
+                elapsed = time.perf_counter() - start
+
+    print(f"items={items} plans={events['plan']} errors={events['error']} upstream_calls={server.app.state.calls}")
+    print(f"first plan {first * 1000:.1f} ms, batch {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(run(*(args or [200, 40])))
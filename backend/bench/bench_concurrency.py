@@ -0,0 +1,60 @@
+"""Show that concurrent plan requests overlap their upstream waits.
+
+Usage (from the backend directory):
+    python -m bench.bench_concurrency [concurrency]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from bench.fake_sonar import FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+
+SAMPLE_INPUT = {
+    "topic": "Rust",
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+
+
+async def run(concurrency: int) -> None:
+    import httpx
+
+    with FakeSonarServer() as server:
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            await client.post("/api/generate-plan", json=SAMPLE_INPUT)
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(
+                    # Distinct topics so the plan cache does not short-circuit the upstream calls
+                    client.post("/api/generate-plan", json={**SAMPLE_INPUT, "topic": f"Rust {i}"})
+                    for i in range(concurrency)
+                )
+            )
+            elapsed = time.perf_counter() - start
+        await main.perplexity_client.aclose()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"single request:            {single * 1000:8.1f} ms")
+    print(f"{concurrency} concurrent requests:  {elapsed * 1000:8.1f} ms ({ok}/{concurrency} ok)")
+    print(f"serial estimate:           {single * concurrency * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
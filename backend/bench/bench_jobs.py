@@ -0,0 +1,90 @@
+"""Compare synchronous plan generation with background jobs against a slow upstream.
+
+Every user requests a distinct plan, once through POST /api/generate-plan (holding
+the connection for the whole Sonar call) and once through POST /api/jobs followed by
+long-polling GET /api/jobs/{id}. Reports how long connections are held and how long
+results take to arrive.
+
+Usage (from the backend directory):
+    python -m bench.bench_jobs [users] [upstream_latency]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from bench.fake_sonar import BackgroundServer, FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+os.environ.setdefault("JOB_WORKERS", "50")
+os.environ.setdefault("PERPLEXITY_MAX_CONCURRENCY", "100")
+os.environ.setdefault("PERPLEXITY_MAX_CONNECTIONS", "100")
+# Measure the job machinery, not the budgets or caches in front of the upstream
+os.environ.setdefault("UPSTREAM_RATE_PER_MINUTE", "0")
+os.environ.setdefault("CLIENT_RATE_PER_MINUTE", "0")
+os.environ.setdefault("TOPIC_MATCH_THRESHOLD", "0")
+
+SAMPLE_INPUT = {
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+
+
+def summary(label: str, values) -> str:
+    ordered = sorted(values)
+    return (
+        f"{label} p50 {ordered[len(ordered) // 2] * 1000:7.1f} ms  "
+        f"p99 {ordered[int(len(ordered) * 0.99)] * 1000:7.1f} ms"
+    )
+
+
+async def sync_user(client, topic: str):
+    start = time.perf_counter()
+    response = await client.post("/api/generate-plan", json={**SAMPLE_INPUT, "topic": topic})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def job_user(client, topic: str):
+    start = time.perf_counter()
+    response = await client.post("/api/jobs", json={**SAMPLE_INPUT, "topic": topic})
+    response.raise_for_status()
+    submitted = time.perf_counter() - start
+    location = response.headers["location"]
+    while True:
+        job = (await client.get(location, params={"wait": 25})).json()
+        if job["status"] in ("succeeded", "failed"):
+            return submitted, time.perf_counter() - start
+
+
+async def run(users: int, latency: float) -> None:
+    import httpx
+
+    with FakeSonarServer() as server:
+        server.app.state.latency = latency
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        print(f"{users} users, upstream latency {latency:.1f}s")
+        with BackgroundServer(main.app, port=8766) as backend:
+            limits = httpx.Limits(max_connections=users * 2)
+            async with httpx.AsyncClient(base_url=backend.base_url, timeout=300, limits=limits) as client:
+                held = await asyncio.gather(*(sync_user(client, f"Sync {i}") for i in range(users)))
+                print(summary("sync   connection held", held))
+
+                results = await asyncio.gather(*(job_user(client, f"Job {i}") for i in range(users)))
+                print(summary("jobs   submit         ", [submitted for submitted, _ in results]))
+                print(summary("jobs   result         ", [finished for _, finished in results]))
+
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 2.0,
+    ))
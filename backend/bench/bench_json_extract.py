@@ -0,0 +1,79 @@
+"""Compare the legacy regex fallback with the single-pass JSON extractor.
+
+Runs both over the malformed Sonar content corpus in bench/fixtures and reports
+parse success, resources recovered and microseconds per response.
+
+Usage (from the backend directory):
+    python -m bench.bench_json_extract
+"""
+import json
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from json_extract import extract_plan_json, find_plan_object
+
+CORPUS_PATH = Path(__file__).parent / "fixtures" / "malformed_sonar_content.json"
+
+
+def legacy_extract(content: str) -> Optional[dict]:
+    """The regex fallback generate_plan used before json_extract"""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    json_match = re.search(r'\{[\s\S]*?"resources"[\s\S]*?\}', content)
+    if not json_match:
+        return None
+    json_text = json_match.group(0)
+    json_text = re.sub(r'```json|```', '', json_text)
+    json_text = json_text.replace("\'", "\"")
+    json_text = re.sub(r',\s*\}', '}', json_text)
+    try:
+        return json.loads(json_text.strip())
+    except json.JSONDecodeError:
+        return None
+
+
+def new_extract(content: str) -> Optional[dict]:
+    """json.loads first, then the single-pass extractor (as in parse_plan_content)"""
+    try:
+        return find_plan_object(json.loads(content))
+    except json.JSONDecodeError:
+        return extract_plan_json(content)
+
+
+def measure(fn, content: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(content)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def resource_count(data: Optional[dict]) -> int:
+    if not isinstance(data, dict) or not isinstance(data.get("resources"), list):
+        return 0
+    return len(data["resources"])
+
+
+def main(repeat: int = 200) -> None:
+    corpus = json.loads(CORPUS_PATH.read_text())
+    print(f"{'sample':32} {'legacy':>14} {'µs':>9} {'extractor':>14} {'µs':>9}")
+    totals = {"legacy": [0, 0.0], "new": [0, 0.0]}
+    for sample in corpus:
+        content = sample["content"]
+        row = [f"{sample['name']:32}"]
+        for name, fn in (("legacy", legacy_extract), ("new", new_extract)):
+            count = resource_count(fn(content))
+            micros = measure(fn, content, repeat)
+            totals[name][0] += count > 0
+            totals[name][1] += micros
+            row.append(f"{('%d resources' % count) if count else 'failed':>14} {micros:9.1f}")
+        print(" ".join(row))
+    for name, (ok, micros) in totals.items():
+        print(f"{name:8} success {ok}/{len(corpus)}  mean {micros / len(corpus):.1f} µs/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure the link checker against a local HTTP server with known link health.
+
+Serves live pages, 404s, pages that refuse HEAD (405, answered with GET), redirects
+and slow pages from a local app, mixed with fictional (example.com) links and a port
+nothing listens on (unknown: a refused connection may be temporary). Checks them all with the pooled checker and reports throughput
+and how many links got the expected status.
+
+Usage (from the backend directory):
+    python -m bench.bench_links [links] [concurrency] [page_latency]
+"""
+import asyncio
+import sys
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import RedirectResponse
+
+from bench.fake_sonar import BackgroundServer
+from link_checker import LinkChecker
+
+PORT = 8767
+site = FastAPI()
+site.state.latency = 0.0
+
+
+@site.api_route("/ok/{page}", methods=["GET", "HEAD"])
+async def ok(page: int):
+    await asyncio.sleep(site.state.latency)
+    return Response("ok")
+
+
+@site.api_route("/gone/{page}", methods=["GET", "HEAD"])
+async def gone(page: int):
+    return Response("gone", status_code=404)
+
+
+@site.api_route("/nohead/{page}", methods=["GET", "HEAD"])
+async def nohead(page: int, request: Request):
+    return Response(status_code=405) if request.method == "HEAD" else Response("ok")
+
+
+@site.api_route("/moved/{page}", methods=["GET", "HEAD"])
+async def moved(page: int):
+    return RedirectResponse(f"/ok/{page}", status_code=301)
+
+
+def links(count: int):
+    """(url, expected status) pairs cycling through every kind of link"""
+    base = f"http://127.0.0.1:{PORT}"
+    kinds = [
+        (lambda i: f"{base}/ok/{i}", "ok"),
+        (lambda i: f"{base}/gone/{i}", "dead"),
+        (lambda i: f"{base}/nohead/{i}", "ok"),
+        (lambda i: f"{base}/moved/{i}", "ok"),
+        (lambda i: f"https://example.com/course-{i}", "fictional"),
+        (lambda i: f"http://127.0.0.1:9/page-{i}", "unknown"),
+    ]
+    return [(kinds[i % len(kinds)][0](i), kinds[i % len(kinds)][1]) for i in range(count)]
+
+
+async def run(count: int, concurrency: int) -> None:
+    pairs = links(count)
+    # Every local link shares one host, so let the per-host limit match the pool
+    checker = LinkChecker(concurrency=concurrency, per_host=concurrency, timeout=5, allow_private=True)
+    start = time.perf_counter()
+    results = await checker.check_many(url for url, _ in pairs)
+    elapsed = time.perf_counter() - start
+    await checker.aclose()
+    correct = sum(status == expected for (_, expected), (status, _) in zip(pairs, results))
+    counts = Counter(status for status, _ in results)
+    print(f"{count} links, concurrency {concurrency}, page latency {site.state.latency * 1000:.0f} ms")
+    print(f"  {elapsed:.2f}s, {count / elapsed:.0f} links/s, {correct}/{count} as expected")
+    print("  " + ", ".join(f"{status} {n}" for status, n in counts.most_common()))
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    site.state.latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    with BackgroundServer(site, port=PORT):
+        asyncio.run(run(count, concurrency))
@@ -0,0 +1,135 @@
+"""Per-plan build + serialize time and peak memory, response_model path vs. fast path.
+
+The legacy path builds the plan with UUID4-derived ids and returns it through
+FastAPI's response_model handling (model_dump, re-validation, JSON-mode dump,
+json.dumps). The fast path uses the cheaper id generator and serializes the
+model directly with json_response. Both must produce identical bytes.
+
+Usage (from the backend directory):
+    python -m bench.bench_plan_build
+"""
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import List
+
+from pydantic import TypeAdapter
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+import main
+from main import LearningPlan, TopicInputData
+
+SIZES = [6, 30, 200]
+LIST_SIZE = 50  # plans per GET /api/plans page
+INPUT = TopicInputData(
+    topic="Rust",
+    timeframe=3,
+    timeframeUnit="months",
+    knowledgeLevel="beginner",
+    preferences=["video", "text"],
+    studyTimePerDay=2,
+)
+
+_plan_adapter = TypeAdapter(LearningPlan)
+_plan_list_adapter = TypeAdapter(List[LearningPlan])
+
+
+def plan_data(size: int) -> dict:
+    return {
+        "resources": [
+            {
+                "title": f"Résumé of chapter {i}",
+                "url": f"https://example.com/{i}",
+                "type": "text",
+                "description": "Read the chapter and do the exercises.",
+                "estimatedTime": 30 + i % 5 * 15,
+            }
+            for i in range(size)
+        ]
+    }
+
+
+@contextmanager
+def legacy_ids():
+    """Generate ids the way generate_id did before"""
+    fast = main.generate_id
+    main.generate_id = lambda: str(uuid.uuid4())[:15]
+    try:
+        yield
+    finally:
+        main.generate_id = fast
+
+
+def response_model_serialize(content, adapter: TypeAdapter = _plan_adapter) -> bytes:
+    """What FastAPI does with a returned model and a response_model"""
+    if isinstance(content, list):
+        content = [plan.model_dump(by_alias=True) for plan in content]
+    else:
+        content = content.model_dump(by_alias=True)
+    value = adapter.validate_python(content)
+    jsonable = adapter.dump_python(value, mode="json", by_alias=True)
+    return json.dumps(jsonable, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(data: dict) -> bytes:
+    return main.json_response(main.build_learning_plan(INPUT, data)).body
+
+
+def legacy_path(data: dict) -> bytes:
+    with legacy_ids():
+        return response_model_serialize(main.build_learning_plan(INPUT, data))
+
+
+def measure(fn, data, rounds: int):
+    """Best per-call time of five runs, and peak traced memory of one call"""
+    fn(data)
+    per_call = min(_timed(fn, data, rounds) for _ in range(5))
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def _timed(fn, data, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(data)
+    return (time.perf_counter() - start) / rounds
+
+
+def report(label: str, legacy, fast) -> None:
+    (legacy_time, legacy_peak), (fast_time, fast_peak) = legacy, fast
+    print(
+        f"{label:22} response_model {legacy_time * 1e6:8.1f} us (peak {legacy_peak / 1024:6.1f} KiB)  "
+        f"fast {fast_time * 1e6:8.1f} us (peak {fast_peak / 1024:6.1f} KiB)  "
+        f"{legacy_time / fast_time:4.2f}x"
+    )
+
+
+def main_bench() -> None:
+    for size in SIZES:
+        data = plan_data(size)
+        plan = main.build_learning_plan(INPUT, data)
+        # The same plan must serialize to the same bytes on both paths
+        assert main.json_response(plan).body == response_model_serialize(plan), "serialized bytes differ"
+
+        rounds = max(20, 2000 // size)
+        report(f"build+serialize {size:3d}", measure(legacy_path, data, rounds), measure(fast_path, data, rounds))
+
+    plans = [main.build_learning_plan(INPUT, plan_data(30)) for _ in range(LIST_SIZE)]
+    assert main.json_response(plans).body == response_model_serialize(plans, _plan_list_adapter)
+    report(
+        f"list of {LIST_SIZE} plans",
+        measure(lambda content: response_model_serialize(content, _plan_list_adapter), plans, 20),
+        measure(lambda content: main.json_response(content).body, plans, 20),
+    )
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,162 @@
+"""A/B comparison of the prompt profiles (verbose, compact, minimal).
+
+For every profile and sample topic, sends the plan request, parses the response the
+way /api/generate-plan does and reports prompt and completion tokens (from the
+usage block), parse success, resources per plan and end-to-end latency.
+
+Three sources of responses:
+- default: the fake Sonar server, whose latency grows with completion tokens
+  (FAKE_SONAR_TOKEN_LATENCY seconds per token, default 0.01);
+- record: the upstream configured by PERPLEXITY_API_KEY / PERPLEXITY_API_URL, with
+  every response saved to a fixture file;
+- replay: a fixture file saved by record, re-parsed offline.
+
+Usage (from the backend directory):
+    python -m bench.bench_prompts [rounds]
+    python -m bench.bench_prompts record fixtures.json [rounds]
+    python -m bench.bench_prompts replay fixtures.json
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+from fastapi import HTTPException
+
+from bench.fake_sonar import FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+TOPICS = [
+    "Rust", "Linear algebra", "Spanish", "Kubernetes",
+    "Music theory", "Organic chemistry", "Digital photography", "React",
+]
+
+
+def sample_input(topic: str):
+    from main import TopicInputData
+
+    return TopicInputData(
+        topic=topic,
+        timeframe=4,
+        timeframeUnit="weeks",
+        knowledgeLevel="beginner",
+        preferences=["video", "text"],
+        studyTimePerDay=2,
+    )
+
+
+def parse(content: str, topic: str) -> int:
+    """Resources parsed out of a response, 0 if it cannot be parsed"""
+    import main
+
+    try:
+        plan_data = main.parse_plan_content(content)
+        return len([main.make_resource(resource, sample_input(topic)) for resource in plan_data["resources"]])
+    except HTTPException:
+        return 0
+
+
+async def call(profile: str, topic: str) -> Dict:
+    import main
+
+    payload = main.build_sonar_payload(sample_input(topic), profile)
+    start = time.perf_counter()
+    response = await main.perplexity_client.chat_completion(payload)
+    result = response.json()
+    record = {
+        "profile": profile,
+        "topic": topic,
+        "content": result["choices"][0]["message"]["content"],
+        "finishReason": result["choices"][0].get("finish_reason"),
+        "usage": result.get("usage", {}),
+        "latency": time.perf_counter() - start,  # upstream only; parsing is timed separately
+    }
+    parse_record(record)
+    return record
+
+
+def parse_record(record: Dict) -> None:
+    start = time.perf_counter()
+    record["resources"] = parse(record["content"], record["topic"])
+    record["parseSeconds"] = time.perf_counter() - start
+
+
+async def collect(rounds: int) -> List[Dict]:
+    from prompts import PROFILES
+
+    records = []
+    for _ in range(rounds):
+        for topic in TOPICS:
+            for profile in PROFILES:
+                records.append(await call(profile, topic))
+    return records
+
+
+def report(records: List[Dict]) -> None:
+    from prompts import PROFILES
+
+    print(f"{'profile':8} {'prompt tok':>10} {'compl. tok':>10} {'parsed':>7} {'truncated':>9} {'resources':>9} {'tok/res':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for profile in PROFILES:
+        rows = [record for record in records if record["profile"] == profile]
+        if not rows:
+            continue
+        latencies = sorted(record["latency"] + record["parseSeconds"] for record in rows)
+        n = len(rows)
+        completion_tokens = sum(record["usage"].get("completion_tokens", 0) for record in rows)
+        resources = sum(record["resources"] for record in rows)
+        print(
+            f"{profile:8} "
+            f"{sum(record['usage'].get('prompt_tokens', 0) for record in rows) / n:10.0f} "
+            f"{completion_tokens / n:10.0f} "
+            f"{sum(1 for record in rows if record['resources']) / n:7.0%} "
+            f"{sum(1 for record in rows if record['finishReason'] == 'length') / n:9.0%} "
+            f"{resources / n:9.1f} {completion_tokens / max(1, resources):7.0f} "
+            f"{latencies[n // 2] * 1000:8.0f} {latencies[min(n - 1, int(n * 0.95))] * 1000:8.0f}"
+        )
+
+
+async def fake(rounds: int) -> None:
+    with FakeSonarServer() as server:
+        server.app.state.latency = 0.3  # time to first token
+        server.app.state.token_latency = float(os.getenv("FAKE_SONAR_TOKEN_LATENCY", "0.01"))
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        records = await collect(rounds)
+        await main.perplexity_client.aclose()
+    report(records)
+
+
+async def record(path: str, rounds: int) -> None:
+    import main
+
+    records = await collect(rounds)
+    await main.perplexity_client.aclose()
+    with open(path, "w") as f:
+        json.dump(records, f, indent=2)
+    report(records)
+
+
+def replay(path: str) -> None:
+    with open(path) as f:
+        records = json.load(f)
+    for record in records:
+        # Recorded upstream time plus this tree's parsing
+        parse_record(record)
+    report(records)
+
+
+if __name__ == "__main__":
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args = sys.argv[1:]
+    if args and args[0] == "record":
+        asyncio.run(record(args[1], int(args[2]) if len(args) > 2 else 1))
+    elif args and args[0] == "replay":
+        replay(args[1])
+    else:
+        asyncio.run(fake(int(args[0]) if args else 1))
@@ -0,0 +1,107 @@
+"""Compare the plain and resilient Perplexity clients against a flaky upstream.
+
+The fake Sonar server fails a fraction of calls with 503/429 and answers some very
+slowly. Reports success rate and latency percentiles per client, then shows the
+circuit breaker failing fast during a full outage.
+
+Usage (from the backend directory):
+    python -m bench.bench_resilience [requests]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from bench.fake_sonar import FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+
+PAYLOAD = {"model": "sonar", "messages": [{"role": "user", "content": "Rust"}]}
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_client(client, requests: int, concurrency: int = 8) -> None:
+    # Stay below the client's connection limit so latency is not queueing time
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await client.chat_completion(PAYLOAD)
+                ok = True
+            except Exception:
+                ok = False
+            return ok, time.perf_counter() - start
+
+    results = await asyncio.gather(*(one() for _ in range(requests)))
+    latencies = [elapsed for ok, elapsed in results if ok]
+    succeeded = len(latencies)
+    line = f"{succeeded / requests:6.1%} ok"
+    if latencies:
+        line += "".join(
+            f"  p{int(q * 100)} {percentile(latencies, q) * 1000:7.1f} ms" for q in (0.5, 0.95, 0.99)
+        )
+    print(line)
+
+
+async def run(requests: int) -> None:
+    from perplexity_client import PerplexityClient
+    from resilience import CircuitBreaker, CircuitOpenError, ResilientPerplexityClient
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    api_key = os.environ["PERPLEXITY_API_KEY"]
+
+    with FakeSonarServer() as server:
+        state = server.app.state
+        state.latency = 0.1
+        state.error_rate = 0.15
+        state.rate_limit_rate = 0.05
+        state.retry_after = 0.2
+        state.slow_rate = 0.05
+        state.slow_latency = 2.0
+        print(f"{requests} requests, 15% 503s, 5% 429s, 5% slow ({state.slow_latency:.0f}s)")
+
+        clients = [
+            ("plain", PerplexityClient(api_key, api_url=server.url)),
+            ("retries", ResilientPerplexityClient(api_key, api_url=server.url, backoff_base=0.05)),
+        ]
+        hedged = ResilientPerplexityClient(api_key, api_url=server.url, backoff_base=0.05, hedge=True)
+        # Warm the latency window so the hedge delay is known
+        await asyncio.gather(*(hedged.chat_completion(PAYLOAD) for _ in range(40)), return_exceptions=True)
+        clients.append(("retries+hedging", hedged))
+
+        for name, client in clients:
+            print(f"{name:16}", end=" ", flush=True)
+            await run_client(client, requests)
+            await client.aclose()
+
+        # Full outage: the breaker opens and later calls fail without reaching the upstream
+        state.fail_status = 503
+        breaker = CircuitBreaker(min_calls=10, cooldown=30)
+        client = ResilientPerplexityClient(api_key, api_url=server.url, max_retries=0, breaker=breaker)
+        calls_before = state.calls
+        start = time.perf_counter()
+        rejected = 0
+        for _ in range(50):
+            try:
+                await client.chat_completion(PAYLOAD)
+            except CircuitOpenError:
+                rejected += 1
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        print(
+            f"outage: 50 calls in {elapsed * 1000:.0f} ms, {state.calls - calls_before} reached upstream, "
+            f"{rejected} rejected by the open circuit"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,105 @@
+"""Compare the legacy O(milestones x resources) scheduler with the offset-based one.
+
+Usage (from the backend directory):
+    python -m bench.bench_scheduler
+"""
+import os
+import time
+import warnings
+from datetime import datetime, timedelta
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+from main import Milestone, Resource, create_milestones, generate_id, schedule_resources
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+SIZES = [10, 100, 1000, 10000]
+TIMEFRAME_DAYS = 12 * 30  # a 12 month plan
+
+
+def legacy_distribute(resources, start_date, end_date):
+    """distribute_resources_over_time before the scheduler module"""
+    total_days = (end_date - start_date).days
+    days_per_resource = max(1, total_days // len(resources))
+    distributed_resources = []
+    for i, resource in enumerate(resources):
+        due_date = start_date + timedelta(days=i * days_per_resource)
+        if due_date > end_date:
+            due_date = end_date
+        resource_dict = resource.dict()
+        resource_dict.pop("dueDate", None)
+        distributed_resources.append(Resource(**resource_dict, dueDate=due_date.isoformat()))
+    return distributed_resources
+
+
+def legacy_milestones(resources, start_date, end_date):
+    """create_milestones before the scheduler module"""
+    total_days = (end_date - start_date).days
+    milestone_count = max(1, total_days // 7)
+    days_per_milestone = total_days // milestone_count
+    milestones = []
+    for i in range(milestone_count):
+        milestone_date = start_date + timedelta(days=(i + 1) * days_per_milestone)
+        resources_for_milestone = []
+        for resource in resources:
+            if resource.dueDate:
+                resource_date = datetime.fromisoformat(resource.dueDate)
+                if resource_date <= milestone_date:
+                    resources_for_milestone.append(resource)
+        resource_ids = [r.id for r in resources_for_milestone[-3:]] if resources_for_milestone else []
+        milestones.append(Milestone(
+            id=generate_id(),
+            title=f"Milestone {i + 1}",
+            description="Complete key resources and test your understanding",
+            targetDate=milestone_date.isoformat(),
+            completed=False,
+            resources=resource_ids,
+        ))
+    return milestones
+
+
+def make_resources(count):
+    return [
+        Resource(
+            id=generate_id(),
+            title=f"Resource {i}",
+            url=f"https://example.com/{i}",
+            type="text",
+            description="Benchmark resource",
+            estimatedTime=30 + (i * 37) % 240,
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    start_date = datetime(2026, 1, 1)
+    end_date = start_date + timedelta(days=TIMEFRAME_DAYS)
+    print(f"{'resources':>10} {'legacy ms':>12} {'scheduler ms':>14} {'speedup':>9}")
+    for count in SIZES:
+        resources = make_resources(count)
+        repeat = max(1, 2000 // count)
+
+        def legacy():
+            legacy_milestones(legacy_distribute(resources, start_date, end_date), start_date, end_date)
+
+        def scheduler():
+            scheduled, offsets = schedule_resources(resources, start_date, end_date, 2)
+            create_milestones(scheduled, start_date, end_date, offsets)
+
+        legacy_ms = timed(legacy, repeat)
+        scheduler_ms = timed(scheduler, repeat)
+        print(f"{count:>10} {legacy_ms:>12.2f} {scheduler_ms:>14.2f} {legacy_ms / scheduler_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Count upstream calls made by identical concurrent plan requests.
+
+Fails (exit status 1) unless each burst is coalesced into one upstream call (with its
+retries), every surviving request gets its own plan and, while the upstream fails,
+every request gets an error.
+
+Usage (from the backend directory):
+    python -m bench.bench_single_flight [concurrency]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from bench.fake_sonar import FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+
+SAMPLE_INPUT = {
+    "topic": "Rust",
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+
+
+async def burst(main, fake_app, concurrency: int, topic: str, cancel: int = 0) -> dict:
+    """Fire identical requests at once, optionally cancelling some of them midway"""
+    from fastapi import HTTPException
+
+    calls_before = fake_app.state.calls
+    input_data = main.TopicInputData(**{**SAMPLE_INPUT, "topic": topic})
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(main.generate_plan(input_data)) for _ in range(concurrency)]
+    if cancel:
+        await asyncio.sleep(fake_app.state.latency / 2)
+        for task in tasks[:cancel]:
+            task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    # generate_plan returns the serialized plan
+    plans = [main.LearningPlan.model_validate_json(r.body) for r in results if isinstance(r, main.Response)]
+    errors = [r for r in results if isinstance(r, HTTPException)]
+    cancelled = [r for r in results if isinstance(r, asyncio.CancelledError)]
+    counts = {
+        "upstream_calls": fake_app.state.calls - calls_before,
+        "plans": len(plans),
+        "unique_plan_ids": len({p.id for p in plans}),
+        "errors": len(errors),
+        "cancelled": len(cancelled),
+    }
+    print(
+        f"{topic!r:24} requests={concurrency:4} upstream_calls={counts['upstream_calls']:3} "
+        f"plans={counts['plans']:4} unique_plan_ids={counts['unique_plan_ids']:4} "
+        f"errors={counts['errors']:4} cancelled={counts['cancelled']:4} elapsed={elapsed * 1000:7.1f} ms"
+    )
+    return counts
+
+
+def check(failures: list, condition: bool, message: str) -> None:
+    if not condition:
+        failures.append(message)
+
+
+async def run(concurrency: int) -> int:
+    with FakeSonarServer() as server:
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        fake_app = server.app
+
+        failures: list = []
+        counts = await burst(main, fake_app, concurrency, "Rust")
+        check(failures, counts["upstream_calls"] == 1, f"Rust: {counts['upstream_calls']} upstream calls, expected 1")
+        check(failures, counts["unique_plan_ids"] == concurrency, f"Rust: {counts['unique_plan_ids']} distinct plans for {concurrency} requests")
+
+        cancel = concurrency // 2
+        counts = await burst(main, fake_app, concurrency, "Go", cancel=cancel)
+        check(failures, counts["upstream_calls"] == 1, f"Go: {counts['upstream_calls']} upstream calls, expected 1")
+        check(failures, counts["cancelled"] == cancel, f"Go: {counts['cancelled']} cancelled, expected {cancel}")
+        check(failures, counts["unique_plan_ids"] == concurrency - cancel, f"Go: {counts['unique_plan_ids']} distinct plans for {concurrency - cancel} remaining requests")
+
+        fake_app.state.fail_status = 503
+        counts = await burst(main, fake_app, concurrency, "Haskell")
+        fake_app.state.fail_status = 0
+        attempts = main.perplexity_client.max_retries + 1
+        check(failures, counts["upstream_calls"] == attempts, f"Haskell: {counts['upstream_calls']} upstream calls, expected one call with retries ({attempts})")
+        check(failures, counts["errors"] == concurrency, f"Haskell: {counts['errors']} of {concurrency} requests got an error")
+        await main.perplexity_client.aclose()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)))
@@ -0,0 +1,63 @@
+"""Compare time-to-first-resource of the streaming and buffered plan endpoints.
+
+Usage (from the backend directory):
+    python -m bench.bench_streaming
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from bench.fake_sonar import BackgroundServer, FakeSonarServer
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "pplx-" + "0" * 32)
+os.environ.setdefault("PLAN_STORE_DB", ":memory:")
+
+
+SAMPLE_INPUT = {
+    "topic": "Rust",
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+
+
+async def run() -> None:
+    import httpx
+
+    with FakeSonarServer() as server:
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import main
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        # A real server is needed: the in-process ASGI transport buffers streamed bodies
+        with BackgroundServer(main.app, port=8766) as backend:
+            async with httpx.AsyncClient(base_url=backend.base_url, timeout=30) as client:
+                start = time.perf_counter()
+                response = await client.post("/api/generate-plan", json={**SAMPLE_INPUT, "topic": "Rust buffered"})
+                buffered = time.perf_counter() - start
+                print(f"buffered:  first resource {buffered * 1000:7.1f} ms, plan {buffered * 1000:7.1f} ms "
+                      f"({len(response.json()['resources'])} resources)")
+
+                start = time.perf_counter()
+                first = None
+                events = []
+                payload = {**SAMPLE_INPUT, "topic": "Rust streamed"}
+                async with client.stream("POST", "/api/generate-plan/stream", json=payload) as response:
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        events.append(event["event"])
+                        if first is None and event["event"] == "resource":
+                            first = time.perf_counter() - start
+                total = time.perf_counter() - start
+                print(f"streaming: first resource {first * 1000:7.1f} ms, plan {total * 1000:7.1f} ms "
+                      f"({events.count('resource')} resources, final event {events[-1]!r})")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,125 @@
+"""Offline evaluation of the near-duplicate topic index at 100k cached topics.
+
+Indexes synthetic topics (one to three made-up words each), then looks up:
+- paraphrases of indexed topics (framing words, case, word order), which should
+  match the original topic,
+- one-letter typos of indexed topics, which match only if similar enough,
+- unseen topics, which should not match anything,
+- numbered and versioned courses ("Calculus 2" after "Calculus 1"), which must not
+  match each other; any match makes the run fail (exit status 1).
+
+Reports build time, match rates, wrong matches and lookup latency percentiles.
+
+Usage (from the backend directory):
+    python -m bench.bench_topic_index [topics] [queries]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from topic_index import TopicIndex
+
+SYLLABLES = "ka lo mi ne ru sa ti vo xe zu ba de fi go hu ja ko li mu no pe qu ra se to".split()
+PREFIXES = ["Learn {}", "Introduction to {}", "{} basics", "{} for beginners", "Mastering {}", "{} programming"]
+
+# (indexed topic, query) pairs naming different courses or versions
+NUMBERED = [
+    ("Calculus 1", "Calculus 2"),
+    ("Organic Chemistry 1", "Organic Chemistry 2"),
+    ("Calculus I", "Calculus II"),
+    ("Python 2", "Python 3"),
+    ("Angular 2", "Angular 17"),
+    ("ES5 JavaScript", "ES6 JavaScript"),
+    ("Physics 101", "Physics 201"),
+]
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_topic(rng: random.Random) -> str:
+    return " ".join(make_word(rng) for _ in range(rng.randint(1, 3)))
+
+
+def request(topic: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        topic=topic, timeframe=1, timeframeUnit="months", knowledgeLevel="beginner", preferences=["text"]
+    )
+
+
+def paraphrase(rng: random.Random, topic: str) -> str:
+    words = topic.split()
+    rng.shuffle(words)
+    text = rng.choice(PREFIXES).format(" ".join(words))
+    return text.upper() if rng.random() < 0.3 else text.title()
+
+
+def typo(rng: random.Random, topic: str) -> str:
+    index = rng.randrange(len(topic))
+    while topic[index] == " ":
+        index = rng.randrange(len(topic))
+    return topic[:index] + rng.choice("aeiouxyz") + topic[index + 1:]
+
+
+def evaluate(index: TopicIndex, queries, label: str) -> int:
+    latencies = []
+    matched = wrong = 0
+    for query, expected in queries:
+        start = time.perf_counter()
+        match = index.lookup(request(query))
+        latencies.append(time.perf_counter() - start)
+        if match is not None:
+            if match[0] == expected:
+                matched += 1
+            else:
+                wrong += 1
+    latencies.sort()
+    n = len(queries)
+    print(
+        f"{label:12} matched {matched / n:6.1%}  wrong {wrong / n:6.1%}  "
+        f"p50 {latencies[n // 2] * 1e6:7.1f} us  p99 {latencies[int(n * 0.99)] * 1e6:7.1f} us"
+    )
+    return wrong
+
+
+def main(topics: int, queries: int) -> int:
+    rng = random.Random(42)
+    index = TopicIndex(max_topics=topics)
+    seen = {}
+    while len(seen) < topics:
+        topic = make_topic(rng)
+        seen.setdefault(topic, f"key-{len(seen)}")
+
+    start = time.perf_counter()
+    for topic, key in seen.items():
+        index.add(request(topic), key)
+    elapsed = time.perf_counter() - start
+    print(f"indexed {len(index)} topics in {elapsed:.1f}s ({elapsed / topics * 1e6:.0f} us each)")
+
+    sample = rng.sample(list(seen.items()), queries)
+    evaluate(index, [(paraphrase(rng, topic), key) for topic, key in sample], "paraphrases")
+    evaluate(index, [(typo(rng, topic), key) for topic, key in sample], "typos")
+    unseen = []
+    while len(unseen) < queries:
+        topic = make_topic(rng)
+        if topic not in seen:
+            unseen.append((topic, None))
+    evaluate(index, unseen, "unseen")
+
+    for topic, _ in NUMBERED:
+        index.add(request(topic), f"numbered-{topic}")
+    wrong = evaluate(index, [(query, None) for _, query in NUMBERED], "numbered")
+    # The same course reworded still matches
+    evaluate(index, [(f"Learn {topic}", f"numbered-{topic}") for topic, _ in NUMBERED], "renumbered")
+    if wrong:
+        print(f"FAIL {wrong} numbered courses matched a different course")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+    ))
@@ -0,0 +1,56 @@
+"""Compare loading precomputed plans from a memory-mapped warm cache file with parsing them.
+
+Writes a warm cache file with `plans` entries of sample resources, then times what a
+worker pays at startup (mapping the file versus json.load of the same plans) and per
+lookup (a hit decodes only that entry).
+
+Usage (from the backend directory):
+    python -m bench.bench_warm_cache [plans]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench.fake_sonar import sample_resource
+from warm_cache import WarmCache, write_warm_file
+
+
+def main(plans: int) -> None:
+    resources = [sample_resource(i) for i in range(8)]
+    keys = [os.urandom(32).hex() for _ in range(plans)]
+    expires_at = time.time() + 24 * 60 * 60
+    with tempfile.TemporaryDirectory() as directory:
+        warm_path = os.path.join(directory, "warm_cache.bin")
+        json_path = os.path.join(directory, "warm_cache.json")
+        write_warm_file(warm_path, (([key], {"resources": resources}, expires_at) for key in keys))
+        with open(json_path, "w") as f:
+            json.dump({key: {"resources": resources, "expiresAt": expires_at} for key in keys}, f)
+        print(f"{plans} plans, {os.path.getsize(warm_path) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        with open(json_path) as f:
+            json.load(f)
+        print(f"startup  json.load {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        cache = WarmCache(warm_path)
+        start = time.perf_counter()
+        cache.connect()
+        print(f"startup  mmap      {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        timings = []
+        for key in keys[:5000]:
+            start = time.perf_counter()
+            cache.get(key)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(
+            f"lookup   p50 {timings[len(timings) // 2] * 1e6:6.1f} us  "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1e6:6.1f} us"
+        )
+        cache.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,127 @@
+"""Measure /api/generate-plan throughput with 1 to N production workers.
+
+Starts the fake Sonar server and `start_server.py --production` as subprocesses and
+drives each worker count with a fixed number of concurrent clients. Every request
+uses a distinct topic, so each one goes through the upstream call, parsing,
+scheduling and storage. The load generator shares the machine with the server, so
+run it on a host with spare cores to see the full scaling.
+
+Usage (from the backend directory):
+    python -m bench.bench_workers [max_workers] [seconds] [concurrency]
+"""
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+SONAR_PORT = 8765
+SERVER_PORT = 8770
+
+SAMPLE_INPUT = {
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+
+
+def wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+async def drive(seconds: float, concurrency: int):
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVER_PORT}", limits=limits, timeout=30) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                body = {**SAMPLE_INPUT, "topic": f"Topic {next(counter)}"}
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/generate-plan", json=body)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return len(latencies) / elapsed, latencies, errors
+
+
+def main(max_workers: int, seconds: float, concurrency: int) -> None:
+    env = {
+        **os.environ,
+        "PERPLEXITY_API_KEY": "pplx-" + "0" * 32,
+        "PERPLEXITY_API_URL": f"http://127.0.0.1:{SONAR_PORT}/chat/completions",
+        "PERPLEXITY_MAX_CONCURRENCY": "200",
+        "PERPLEXITY_MAX_CONNECTIONS": "200",
+        "PLAN_STORE_DB": ":memory:",
+        "FAKE_SONAR_LATENCY": os.getenv("FAKE_SONAR_LATENCY", "0.05"),
+    }
+    sonar = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.fake_sonar:app", "--port", str(SONAR_PORT),
+         "--workers", str(max_workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{SONAR_PORT}/docs")
+        worker_counts = sorted({1, *(2 ** i for i in range(1, max_workers.bit_length())), max_workers})
+        print(f"{concurrency} concurrent clients, {seconds:.0f}s per run, upstream latency {env['FAKE_SONAR_LATENCY']}s")
+        baseline = None
+        for workers in worker_counts:
+            server = subprocess.Popen(
+                [sys.executable, "start_server.py", "--production", "--workers", str(workers), "--port", str(SERVER_PORT),
+                 "--log-level", "warning"],
+                env=env,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                wait_until_up(f"http://127.0.0.1:{SERVER_PORT}/api/health")
+                asyncio.run(drive(1, concurrency))  # warm up every worker's connection pool
+                rps, latencies, errors = asyncio.run(drive(seconds, concurrency))
+            finally:
+                stop(server)
+            baseline = baseline or rps
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(
+                f"{workers:2d} worker(s): {rps:8.1f} req/s ({rps / baseline:4.2f}x)  "
+                f"p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  errors {errors}"
+            )
+    finally:
+        stop(sonar)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1),
+        float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 64,
+    )
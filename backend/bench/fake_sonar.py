@@ -0,0 +1,246 @@
+import asyncio
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated upstream latency in seconds
+FAKE_SONAR_LATENCY = float(os.getenv("FAKE_SONAR_LATENCY", "0.5"))
+# Latency distribution around FAKE_SONAR_LATENCY: fixed, uniform (+/- sigma as a fraction)
+# or lognormal (median FAKE_SONAR_LATENCY, shape sigma)
+FAKE_SONAR_LATENCY_DIST = os.getenv("FAKE_SONAR_LATENCY_DIST", "fixed")
+FAKE_SONAR_LATENCY_SIGMA = float(os.getenv("FAKE_SONAR_LATENCY_SIGMA", "0.5"))
+# Sonar responses to replay round-robin instead of generated plans (a JSON list of envelopes)
+FAKE_SONAR_REPLAY = os.getenv("FAKE_SONAR_REPLAY", "")
+# Fractions of calls answered with malformed plan JSON, a 429 or a 503
+FAKE_SONAR_MALFORMED_RATE = float(os.getenv("FAKE_SONAR_MALFORMED_RATE", "0"))
+FAKE_SONAR_RATE_LIMIT_RATE = float(os.getenv("FAKE_SONAR_RATE_LIMIT_RATE", "0"))
+FAKE_SONAR_ERROR_RATE = float(os.getenv("FAKE_SONAR_ERROR_RATE", "0"))
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+def sample_resource(i: int) -> dict:
+    return {
+        "title": f"Sample Resource {i + 1}",
+        "url": f"https://example.com/resource-{i + 1}",
+        "type": "text",
+        "description": "A sample resource returned by the fake Sonar server.",
+        "estimatedTime": 60,
+    }
+
+
+SAMPLE_RESOURCES = [sample_resource(i) for i in range(6)]
+
+
+def load_fixture(path: str) -> list:
+    """A JSON fixture, by path or by name under bench/fixtures"""
+    if not os.path.exists(path):
+        path = os.path.join(FIXTURES, path)
+    with open(path) as f:
+        return json.load(f)
+
+
+def malformed_contents() -> list:
+    """Plan contents that need repairing (or cannot be parsed), from the parser fixtures"""
+    return [case["content"] for case in load_fixture("malformed_sonar_content.json") if case["name"] != "clean"]
+
+app = FastAPI(title="Fake Sonar API")
+app.state.latency = FAKE_SONAR_LATENCY
+app.state.latency_dist = FAKE_SONAR_LATENCY_DIST
+app.state.latency_sigma = FAKE_SONAR_LATENCY_SIGMA
+app.state.calls = 0
+app.state.outcomes = {"ok": 0, "malformed": 0, "rateLimited": 0, "failed": 0}
+# Recorded envelopes replayed in turn (empty: generate plans from the request)
+app.state.responses = load_fixture(FAKE_SONAR_REPLAY) if FAKE_SONAR_REPLAY else []
+app.state.malformed = malformed_contents()
+app.state.fail_status = 0  # non-zero makes every call fail with this status code
+app.state.fail_marker = "FAIL"  # prompts containing this text fail with a 500
+app.state.stream_chunks = 40  # number of content deltas sent in stream mode
+# Random fault injection (fractions of calls)
+app.state.error_rate = FAKE_SONAR_ERROR_RATE  # fail with a 503
+app.state.rate_limit_rate = FAKE_SONAR_RATE_LIMIT_RATE  # fail with a 429 carrying Retry-After
+app.state.malformed_rate = FAKE_SONAR_MALFORMED_RATE  # answer with malformed plan JSON
+app.state.retry_after = 1  # seconds sent in Retry-After
+app.state.slow_rate = 0.0  # respond after slow_latency instead of latency
+app.state.slow_latency = 5.0
+# Generation time per completion token, added to latency (e.g. 0.01 for 100 tokens/s)
+app.state.token_latency = float(os.getenv("FAKE_SONAR_TOKEN_LATENCY", "0"))
+if app.state.latency_dist not in LATENCY_DISTRIBUTIONS:
+    raise ValueError(f"FAKE_SONAR_LATENCY_DIST must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+_replay_turn = itertools.count()
+
+
+def sample_latency(base: float) -> float:
+    """Draw a latency from the configured distribution around base"""
+    sigma = app.state.latency_sigma
+    if base <= 0 or app.state.latency_dist == "fixed":
+        return base
+    if app.state.latency_dist == "uniform":
+        return random.uniform(base * max(0.0, 1 - sigma), base * (1 + sigma))
+    return random.lognormvariate(math.log(base), sigma)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def requested_content(body: dict) -> tuple:
+    """Plan content honoring the requested resource count, fields and max_tokens.
+
+    Returns (content, finish_reason). Prompts asking for "exactly N" resources get N,
+    others the six sample resources; only the fields required by response_format are
+    included, and content beyond max_tokens is cut off as a real model would.
+    """
+    prompt = body["messages"][-1]["content"]
+    match = re.search(r"exactly (\d+)", prompt)
+    resources = [sample_resource(i) for i in range(int(match.group(1)))] if match else SAMPLE_RESOURCES
+    try:
+        fields = body["response_format"]["json_schema"]["schema"]["properties"]["resources"]["items"]["required"]
+        resources = [{field: resource[field] for field in fields if field in resource} for resource in resources]
+    except (KeyError, TypeError):
+        pass
+    content = json.dumps({"resources": resources})
+    max_chars = body.get("max_tokens", 0) * 4
+    if max_chars and len(content) > max_chars:
+        return content[:max_chars], "length"
+    return content, "stop"
+
+
+def completion_body(content: str, prompt_tokens: int = 300, finish_reason: str = "stop") -> dict:
+    """Wrap content in a Sonar chat completion envelope"""
+    completion_tokens = estimate_tokens(content) if content else 0
+    return {
+        "id": "fake-completion",
+        "model": "sonar",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": finish_reason,
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def stream_body(content: str, latency: float):
+    """Emit content as SSE deltas spread evenly over latency"""
+    chunks = app.state.stream_chunks
+    size = max(1, -(-len(content) // chunks))
+    for start in range(0, len(content), size):
+        await asyncio.sleep(latency / chunks)
+        chunk = completion_body("")
+        chunk["object"] = "chat.completion.chunk"
+        chunk["choices"][0]["delta"] = {"role": "assistant", "content": content[start:start + size]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    """Return a canned learning plan after the configured latency"""
+    body = await request.json()
+    app.state.calls += 1
+    replayed = None
+    if app.state.responses:
+        replayed = copy.deepcopy(app.state.responses[next(_replay_turn) % len(app.state.responses)])
+        content, finish_reason = replayed["choices"][0]["message"]["content"], "stop"
+    else:
+        content, finish_reason = requested_content(body)
+    malformed = random.random() < app.state.malformed_rate
+    if malformed:
+        content = random.choice(app.state.malformed)
+    prompt = body["messages"][-1]["content"]
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in body["messages"])
+    fail_status = app.state.fail_status or (500 if app.state.fail_marker in prompt else 0)
+    headers = {}
+    roll = random.random()
+    if not fail_status and roll < app.state.rate_limit_rate:
+        fail_status = 429
+        headers["Retry-After"] = str(app.state.retry_after)
+    elif not fail_status and roll < app.state.rate_limit_rate + app.state.error_rate:
+        fail_status = 503
+    latency = app.state.slow_latency if random.random() < app.state.slow_rate else sample_latency(app.state.latency)
+    latency += app.state.token_latency * estimate_tokens(content)
+    if fail_status:
+        app.state.outcomes["rateLimited" if fail_status == 429 else "failed"] += 1
+        await asyncio.sleep(latency)
+        return JSONResponse({"error": "injected failure"}, status_code=fail_status, headers=headers)
+    app.state.outcomes["malformed" if malformed else "ok"] += 1
+    if body.get("stream"):
+        return StreamingResponse(stream_body(content, latency), media_type="text/event-stream")
+    await asyncio.sleep(latency)
+    if replayed is not None:
+        replayed["choices"][0]["message"]["content"] = content
+        replayed["created"] = int(time.time())
+        return replayed
+    return completion_body(content, prompt_tokens, finish_reason)
+
+
+@app.get("/stats")
+async def stats():
+    """Calls received so far, by outcome"""
+    return {"calls": app.state.calls, **app.state.outcomes}
+
+
+class BackgroundServer:
+    """Run an ASGI app under uvicorn on a background thread"""
+
+    def __init__(self, asgi_app, host: str = "127.0.0.1", port: int = 8765):
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(
+            uvicorn.Config(asgi_app, host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+class FakeSonarServer(BackgroundServer):
+    """Run the fake Sonar app on a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765):
+        super().__init__(app, host, port)
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    @property
+    def app(self) -> FastAPI:
+        return app
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_SONAR_PORT", "8765")))
@@ -0,0 +1,410 @@
+"""Scripted load scenarios against production workers, with JSON results for regression checks.
+
+Starts the fake Sonar server (replaying recorded responses from
+bench/fixtures/sonar_responses.json with a lognormal latency and a share of malformed
+and rate-limited responses) and `start_server.py --production`, restarting the
+backend before every scenario so caches start empty:
+
+- steady: open-loop requests to /api/generate-plan at a fixed rate; latency is
+  measured from each request's scheduled start, so a slow server cannot hide
+  its queueing by sending fewer requests
+- burst: a batch of requests sent at once
+- cohort: concurrent POST /api/generate-plans batches, one per cohort; latency is
+  the time until each item's plan arrives
+
+A share of topics repeats earlier ones, as real traffic does. For each scenario the
+report has requests, errors, throughput, p50/p95/p99 latency, upstream calls per
+request and the resident memory of each worker process.
+
+Results are written as JSON (with the git commit) so runs can be diffed across
+commits; with --baseline, the run fails (exit status 1) if throughput, latency,
+upstream calls or memory regress by more than --tolerance, or the error rate
+grows by more than --error-tolerance.
+
+Usage (from the backend directory):
+    python -m bench.load [--scenarios steady,burst,cohort] [--workers N] [--output results.json]
+    python -m bench.load --baseline bench/results/main.json
+    python -m bench.load --compare bench/results/main.json bench/results/latest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SONAR_PORT = 8765
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "latest.json")
+SCENARIOS = ("steady", "burst", "cohort")
+
+# Metrics compared against a baseline: path in a scenario's results, higher is better
+METRICS = (
+    ("throughput", True),
+    ("latencyMs.p50", False),
+    ("latencyMs.p95", False),
+    ("latencyMs.p99", False),
+    ("upstreamCallsPerRequest", False),
+    ("memoryMb.peak", False),
+)
+LATENCY_SLACK_MS = 5  # latency changes below this are noise, whatever the ratio
+
+SAMPLE_INPUT = {
+    "timeframe": 4,
+    "timeframeUnit": "weeks",
+    "knowledgeLevel": "beginner",
+    "preferences": ["video", "text"],
+    "studyTimePerDay": 2,
+}
+SYLLABLES = "ka lo mi ta ren vu sol dra pel qui zan hob fet gri mur nax tov sel cap bri".split()
+
+
+class Topics:
+    """Made-up topics (so no two new ones look alike), repeating earlier ones at a rate"""
+
+    def __init__(self, rng: random.Random, repeat: float):
+        self.rng = rng
+        self.repeat = repeat
+        self.seen: List[str] = []
+
+    def __call__(self) -> str:
+        if self.seen and self.rng.random() < self.repeat:
+            return self.rng.choice(self.seen)
+        words = ("".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))) for _ in range(2))
+        topic = " ".join(words).title()
+        self.seen.append(topic)
+        return topic
+
+
+def free_port() -> int:
+    """A port nothing listens on; restarting on a fixed port can trip over TIME_WAIT sockets"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30, process: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} before coming up")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def upstream_calls() -> int:
+    return httpx.get(f"http://127.0.0.1:{SONAR_PORT}/stats").json()["calls"]
+
+
+def proc_status(pid: int) -> Dict[str, float]:
+    """VmRSS and VmHWM of a process in MB (empty where /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+    status = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in ("VmRSS", "VmHWM"):
+            status[name] = int(value.split()[0]) / 1024
+    return status
+
+
+def worker_pids(server_pid: int) -> List[int]:
+    """uvicorn worker processes of a server; the server itself when it runs one worker"""
+    pids = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else ():
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == server_pid and b"spawn_main" in cmdline:
+            pids.append(int(entry))
+    return pids or [server_pid]
+
+
+def memory(server_pid: int) -> Optional[Dict[str, Any]]:
+    statuses = [status for status in map(proc_status, worker_pids(server_pid)) if status]
+    if not statuses:
+        return None
+    return {
+        "workers": len(statuses),
+        "rss": round(sum(status["VmRSS"] for status in statuses) / len(statuses), 1),
+        "peak": round(max(status["VmHWM"] for status in statuses), 1),
+    }
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, calls: int) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    requests = len(latencies) + errors
+    return {
+        "requests": requests,
+        "errors": errors,
+        "errorRate": round(errors / requests, 4) if requests else 0.0,
+        "seconds": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latencyMs": {name: round(percentile(ordered, fraction) * 1000, 1) for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "upstreamCallsPerRequest": round(calls / requests, 3) if requests else 0.0,
+    }
+
+
+async def plan_request(client: httpx.AsyncClient, topic: str, start: float, latencies: List[float]) -> bool:
+    try:
+        response = await client.post("/api/generate-plan", json={**SAMPLE_INPUT, "topic": topic})
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return False
+    latencies.append(time.perf_counter() - start)
+    return True
+
+
+async def steady(client: httpx.AsyncClient, topics: Topics, args: argparse.Namespace):
+    latencies: List[float] = []
+    start = time.perf_counter()
+
+    async def scheduled(i: int) -> bool:
+        due = start + i / args.rate
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        return await plan_request(client, topics(), due, latencies)
+
+    results = await asyncio.gather(*(scheduled(i) for i in range(int(args.rate * args.duration))))
+    return latencies, results.count(False), time.perf_counter() - start
+
+
+async def burst(client: httpx.AsyncClient, topics: Topics, args: argparse.Namespace):
+    latencies: List[float] = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(plan_request(client, topics(), start, latencies) for _ in range(args.burst)))
+    return latencies, results.count(False), time.perf_counter() - start
+
+
+async def cohort(client: httpx.AsyncClient, topics: Topics, args: argparse.Namespace):
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+
+    async def batch(user: str) -> None:
+        nonlocal errors
+        items = [{**SAMPLE_INPUT, "topic": topics()} for _ in range(args.cohort_size)]
+        received = 0
+        try:
+            async with client.stream("POST", "/api/generate-plans", json=items, headers={"X-User-Id": user}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["event"] == "plan":
+                        latencies.append(time.perf_counter() - start)
+                        received += 1
+                    elif event["event"] == "error":
+                        errors += 1
+                        received += 1
+        except httpx.HTTPError:
+            pass
+        errors += len(items) - received  # items lost with a failed batch
+
+    await asyncio.gather(*(batch(f"cohort-{i}") for i in range(args.cohorts)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def drive(scenario: str, port: int, args: argparse.Namespace):
+    topics = Topics(random.Random(f"{args.seed}-{scenario}"), args.repeat)
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        return await {"steady": steady, "burst": burst, "cohort": cohort}[scenario](client, topics, args)
+
+
+def run_scenario(scenario: str, args: argparse.Namespace, env: Dict[str, str]) -> Dict[str, Any]:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "start_server.py", "--production", "--workers", str(args.workers),
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/api/health", process=server)
+        calls = upstream_calls()
+        latencies, errors, elapsed = asyncio.run(drive(scenario, port, args))
+        result = summarize(latencies, errors, elapsed, upstream_calls() - calls)
+        result["memoryMb"] = memory(server.pid)
+        return result
+    finally:
+        stop(server)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_env = {
+        "FAKE_SONAR_LATENCY": str(args.latency),
+        "FAKE_SONAR_LATENCY_DIST": args.latency_dist,
+        "FAKE_SONAR_LATENCY_SIGMA": str(args.latency_sigma),
+        "FAKE_SONAR_MALFORMED_RATE": str(args.malformed_rate),
+        "FAKE_SONAR_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "FAKE_SONAR_REPLAY": args.replay,
+    }
+    env = {
+        **os.environ,
+        **fake_env,
+        "PERPLEXITY_API_KEY": "pplx-" + "0" * 32,
+        "PERPLEXITY_API_URL": f"http://127.0.0.1:{SONAR_PORT}/chat/completions",
+        "PERPLEXITY_MAX_CONCURRENCY": "200",
+        "PERPLEXITY_MAX_CONNECTIONS": "200",
+        "PLAN_STORE_DB": ":memory:",
+        # Measure the serving path, not the budgets in front of the upstream
+        "UPSTREAM_RATE_PER_MINUTE": "0",
+        "CLIENT_RATE_PER_MINUTE": "0",
+    }
+    sonar = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.fake_sonar:app", "--port", str(SONAR_PORT), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{SONAR_PORT}/stats")
+        scenarios = {}
+        for scenario in args.scenarios:
+            scenarios[scenario] = run_scenario(scenario, args, env)
+            print_scenario(scenario, scenarios[scenario])
+    finally:
+        stop(sonar)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    config = {
+        name: getattr(args, name)
+        for name in ("workers", "duration", "rate", "burst", "cohorts", "cohort_size", "repeat", "seed")
+    }
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {**config, "upstream": fake_env},
+        "scenarios": scenarios,
+    }
+
+
+def print_scenario(name: str, result: Dict[str, Any]) -> None:
+    latency = result["latencyMs"]
+    mem = result["memoryMb"]
+    print(
+        f"{name:7} {result['requests']:5d} req  {result['throughput']:7.1f} req/s  "
+        f"p50 {latency['p50']:7.1f}  p95 {latency['p95']:7.1f}  p99 {latency['p99']:7.1f} ms  "
+        f"errors {result['errorRate']:5.1%}  upstream/req {result['upstreamCallsPerRequest']:.2f}  "
+        + (f"mem/worker {mem['rss']:.0f} MB (peak {mem['peak']:.0f})" if mem else "mem n/a")
+    )
+
+
+def metric(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def regressions(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float, error_tolerance: float) -> List[str]:
+    """Descriptions of every metric that got worse than the baseline allows"""
+    found = []
+    for scenario, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(scenario)
+        if base is None:
+            continue
+        if result["errorRate"] > base["errorRate"] + error_tolerance:
+            found.append(f"{scenario} errorRate {base['errorRate']:.1%} -> {result['errorRate']:.1%}")
+        for path, higher_is_better in METRICS:
+            old, new = metric(base, path), metric(result, path)
+            if not old or new is None:
+                continue
+            if higher_is_better:
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > old * (1 + tolerance)
+                if path.startswith("latencyMs"):
+                    worse = worse and new - old > LATENCY_SLACK_MS
+            if worse:
+                found.append(f"{scenario} {path} {old} -> {new} ({(new - old) / old:+.0%})")
+    return found
+
+
+def check(baseline_path: str, current: Dict[str, Any], args: argparse.Namespace) -> int:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    found = regressions(baseline, current, args.tolerance, args.error_tolerance)
+    print(f"compared with {baseline_path} (commit {baseline.get('commit') or 'unknown'}):")
+    for line in found:
+        print(f"  REGRESSION {line}")
+    if not found:
+        print("  no regressions")
+    return 1 if found else 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run load scenarios and check them against a baseline")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda value: value.split(","))
+    parser.add_argument("--workers", type=int, default=1, help="backend worker processes")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of steady load")
+    parser.add_argument("--rate", type=float, default=20, help="steady requests per second")
+    parser.add_argument("--burst", type=int, default=200, help="requests sent at once in the burst")
+    parser.add_argument("--cohorts", type=int, default=4, help="concurrent batch requests")
+    parser.add_argument("--cohort-size", type=int, default=25, help="items per batch request")
+    parser.add_argument("--repeat", type=float, default=0.3, help="share of requests repeating an earlier topic")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.3, help="median upstream latency in seconds")
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--malformed-rate", type=float, default=0.02, help="share of malformed upstream responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.01, help="share of upstream 429s")
+    parser.add_argument("--replay", default="sonar_responses.json", help="recorded responses to replay ('' generates them)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--baseline", help="results JSON to compare with; exit 1 on regressions")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"), help="only compare two results files")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative change before failing")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="allowed absolute error rate increase")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        with open(args.compare[1]) as f:
+            return check(args.compare[0], json.load(f), args)
+    results = run(args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    return check(args.baseline, results, args) if args.baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
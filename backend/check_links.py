@@ -0,0 +1,66 @@
+"""Check the links of the resource catalog and record which ones are dead or fictional.
+
+Checks the catalog entries that were never checked, or were last checked more than
+--max-age seconds ago, with a concurrent HEAD checker, and stores each link's status
+in the catalog table. Workers reload the statuses every CATALOG_RELOAD_INTERVAL
+seconds and leave bad links out of the plans they build. Run it on a schedule.
+
+Usage (from the backend directory):
+    python check_links.py [--limit 5000] [--max-age 604800] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+
+from link_checker import LINK_CHECK_CONCURRENCY, LINK_CHECK_PER_HOST, LINK_CHECK_TIMEOUT, LinkChecker
+from resource_catalog import ResourceCatalog
+
+
+async def run(args: argparse.Namespace) -> Counter:
+    catalog = ResourceCatalog()
+    checker = LinkChecker(args.concurrency, args.per_host, args.timeout)
+    counts: Counter = Counter()
+    try:
+        due = catalog.due_for_check(args.max_age, args.limit)
+        print(f"Checking {len(due)} links")
+        # Record in chunks so an interrupted run keeps what it checked
+        for start in range(0, len(due), args.chunk):
+            chunk = due[start:start + args.chunk]
+            results = await checker.check_many(url for _, url in chunk)
+            catalog.record_checks(
+                (entry_id, status, http_status) for (entry_id, _), (status, http_status) in zip(chunk, results)
+            )
+            counts.update(status for status, _ in results)
+    finally:
+        await checker.aclose()
+        catalog.close()
+    return counts
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check resource catalog links")
+    parser.add_argument("--limit", type=int, default=5000, help="links to check in this run")
+    parser.add_argument("--max-age", type=float, default=7 * 24 * 60 * 60, help="re-check links older than this (seconds)")
+    parser.add_argument("--concurrency", type=int, default=LINK_CHECK_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=LINK_CHECK_PER_HOST)
+    parser.add_argument("--timeout", type=float, default=LINK_CHECK_TIMEOUT)
+    parser.add_argument("--chunk", type=int, default=500, help="links checked between writes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args = parse_args(argv)
+    start = time.perf_counter()
+    counts = asyncio.run(run(args))
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{count} {status}" for status, count in counts.most_common()) or "nothing to check"
+    print(f"{summary} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+import httpx
+
+from plan_store import PLAN_STORE_DB
+from sqlite_db import open_db
+
+logger = logging.getLogger(__name__)
+
+# Background plan generation settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # jobs run at once per worker process
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "300"))  # seconds
+JOB_TTL = float(os.getenv("JOB_TTL", str(24 * 60 * 60)))  # seconds a finished job is kept
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "25"))  # longest long-poll, below proxy idle timeouts
+JOB_DB = os.getenv("JOB_DB", PLAN_STORE_DB)
+# "memory" queues jobs in the process that accepted them; "sqlite" queues them in the
+# job table, shared by all worker processes and picked up again after a restart
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))  # seconds
+
+# Webhook callbacks: hosts allowed as targets, or "*" for any host with only public
+# addresses (unset disables callbacks)
+JOB_WEBHOOK_HOSTS = {host.strip() for host in os.getenv("JOB_WEBHOOK_HOSTS", "").split(",") if host.strip()}
+JOB_WEBHOOK_SECRET = os.getenv("JOB_WEBHOOK_SECRET", "")
+JOB_WEBHOOK_ATTEMPTS = int(os.getenv("JOB_WEBHOOK_ATTEMPTS", "3"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    callback_url TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at);
+"""
+
+
+class JobError(Exception):
+    """A job failure with the HTTP status and detail reported to the client"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+async def check_callback_url(url: str) -> None:
+    """Raise ValueError unless url is an allowed webhook target.
+
+    The host must be listed in JOB_WEBHOOK_HOSTS, or JOB_WEBHOOK_HOSTS must be "*" and
+    every address the host resolves to public, so job results are never POSTed to
+    loopback, link-local (cloud metadata) or private addresses.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callbackUrl must be an http(s) URL")
+    if not JOB_WEBHOOK_HOSTS:
+        raise ValueError("callbackUrl is not enabled on this server")
+    if parsed.hostname in JOB_WEBHOOK_HOSTS:
+        return
+    if "*" not in JOB_WEBHOOK_HOSTS:
+        raise ValueError(f"callbackUrl host {parsed.hostname} is not allowed")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callbackUrl host {parsed.hostname} does not resolve")
+    for *_, sockaddr in addresses:
+        if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+            raise ValueError(f"callbackUrl host {parsed.hostname} is not a public address")
+
+
+class JobStore:
+    """SQLite table of jobs with their payload, status and result, kept until they expire"""
+
+    def __init__(self, db_path: str = JOB_DB, ttl: float = JOB_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Lazily open the database so each worker process gets its own connection"""
+        if self._connection is None:
+            connection = open_db(self.db_path, SCHEMA)
+            connection.row_factory = sqlite3.Row
+            self._connection = connection
+        return self._connection
+
+    def connect(self) -> None:
+        """Open the database now instead of on first use"""
+        self._db
+
+    def create(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Insert a queued job and return it"""
+        now = time.time()
+        job_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, callback_url, created_at, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), callback_url, now, now, now + self.ttl),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job as returned by the API (None if unknown or expired)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def payload(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def callback_url(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT callback_url FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def mark_running(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, time.time(), job_id)
+            )
+
+    def claim(self, stale_after: float = JOB_TIMEOUT) -> Optional[str]:
+        """Atomically take the oldest queued job (or one abandoned while running) for this process"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE (status = ? OR (status = ? AND updated_at < ?)) AND expires_at > ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now - stale_after, now),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, now, row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row[0] if row else None
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[JobError] = None) -> None:
+        """Store a job's result or error; it then expires ttl seconds from now"""
+        now = time.time()
+        status = FAILED if error is not None else SUCCEEDED
+        error_json = json.dumps({"status": error.status, "detail": error.detail}) if error is not None else None
+        result_json = json.dumps(result) if result is not None else None
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                (status, result_json, error_json, now, now + self.ttl, job_id),
+            )
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND expires_at > ?", (status, time.time())
+            ).fetchone()[0]
+
+    def prune(self) -> int:
+        """Delete expired jobs"""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job: Dict[str, Any] = {
+            "id": row["id"],
+            "status": row["status"],
+            "createdAt": datetime.fromtimestamp(row["created_at"]).isoformat(),
+            "updatedAt": datetime.fromtimestamp(row["updated_at"]).isoformat(),
+            "expiresAt": datetime.fromtimestamp(row["expires_at"]).isoformat(),
+        }
+        if row["result"] is not None:
+            job["plan"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = json.loads(row["error"])
+        return job
+
+
+class JobQueue:
+    """Bounded pool of background workers running jobs from a JobStore.
+
+    Jobs are queued in process (``memory``) or claimed from the job table (``sqlite``),
+    run by at most ``workers`` tasks with a timeout, and their result is stored for
+    polling and POSTed to the job's callback URL, if it has one.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        store: Optional[JobStore] = None,
+        workers: int = JOB_WORKERS,
+        max_queue: int = JOB_MAX_QUEUE,
+        timeout: float = JOB_TIMEOUT,
+        backend: str = JOB_QUEUE_BACKEND,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        if backend not in ("memory", "sqlite"):
+            raise ValueError(f"Unknown job queue backend: {backend}")
+        self.runner = runner
+        self.store = store or JobStore()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._webhooks: Set[asyncio.Task] = set()
+        # Long-polls in progress: an event set when the job finishes, and how many wait on it
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._waiting: Dict[str, int] = {}
+        # Jobs accepted by this process that have not finished yet (memory backend)
+        self._pending: Set[str] = set()
+        self._http: Optional[httpx.AsyncClient] = None
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.running = 0
+
+    def start(self) -> None:
+        """Open the job table and start the workers on the running event loop"""
+        self.store.connect()
+        self.store.prune()
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._http = httpx.AsyncClient(timeout=10)
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def submit(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job and return it, or raise JobQueueFull"""
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise JobQueueFull()
+        job = self.store.create(payload, callback_url)
+        self.submitted += 1
+        if self.submitted % 100 == 0:
+            self.store.prune()
+        if self.backend == "memory":
+            self._pending.add(job["id"])
+            self._queue.put_nowait(job["id"])
+        else:
+            self._wakeup.set()
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once it has finished, or as it is after timeout seconds (long-poll)"""
+        deadline = time.monotonic() + timeout
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        self._waiting[job_id] = self._waiting.get(job_id, 0) + 1
+        try:
+            while True:
+                job = self.store.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in (SUCCEEDED, FAILED) or remaining <= 0:
+                    return job
+                # Jobs finished by other processes are only seen by polling the table
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting[job_id] -= 1
+            if not self._waiting[job_id]:
+                del self._waiting[job_id]
+                del self._waiters[job_id]
+
+    def queue_depth(self) -> int:
+        if self.backend == "memory":
+            return self._queue.qsize() if self._queue is not None else 0
+        return self.store.count(QUEUED)
+
+    async def _next_job(self) -> str:
+        if self.backend == "memory":
+            return await self._queue.get()
+        while True:
+            job_id = self.store.claim(self.timeout)
+            if job_id is not None:
+                return job_id
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._next_job()
+            payload = self.store.payload(job_id)
+            if payload is None:
+                continue
+            if self.backend == "memory":
+                self.store.mark_running(job_id)
+            self.running += 1
+            result, error = None, None
+            try:
+                result = await asyncio.wait_for(self.runner(payload), self.timeout)
+            except JobError as e:
+                error = e
+            except asyncio.TimeoutError:
+                error = JobError(504, "Plan generation timed out")
+            except Exception:
+                logger.exception(f"Job {job_id} failed")
+                error = JobError(500, "Plan generation failed")
+            finally:
+                self.running -= 1
+            self._finish(job_id, result, error)
+
+    def _finish(self, job_id: str, result: Optional[Dict[str, Any]], error: Optional[JobError]) -> None:
+        self.store.finish(job_id, result, error)
+        self._pending.discard(job_id)
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        event = self._waiters.get(job_id)
+        if event is not None:
+            event.set()
+        callback_url = self.store.callback_url(job_id)
+        if callback_url:
+            task = asyncio.ensure_future(self._notify(callback_url, job_id))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+    async def _notify(self, callback_url: str, job_id: str) -> None:
+        """POST the finished job to its callback URL, retrying with backoff"""
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        try:
+            # Again at delivery, in case the host now resolves elsewhere
+            await check_callback_url(callback_url)
+        except ValueError as e:
+            logger.warning(f"Not delivering job {job_id} to its callback URL: {e}")
+            return
+        body = json.dumps(job).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if JOB_WEBHOOK_SECRET:
+            signature = hmac.new(JOB_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-256"] = f"sha256={signature}"
+        for attempt in range(JOB_WEBHOOK_ATTEMPTS):
+            try:
+                response = await self._http.post(callback_url, content=body, headers=headers)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(2 ** attempt)
+        logger.warning(f"Could not deliver job {job_id} to its callback URL")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "running": self.running,
+            "queueDepth": self.queue_depth(),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def close(self) -> None:
+        """Stop the workers; with the memory backend, unfinished jobs of this process fail"""
+        for task in [*self._tasks, *self._webhooks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._webhooks, return_exceptions=True)
+        self._tasks = []
+        for job_id in list(self._pending):
+            self.store.finish(job_id, error=JobError(503, "Server restarted before the job finished, please resubmit"))
+        self._pending.clear()
+        if self._http is not None:
+            await self._http.aclose()
+        self.store.close()
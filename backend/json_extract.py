@@ -0,0 +1,135 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# Characters the scanner has to look at; everything between them is copied verbatim
+_SPECIAL = re.compile(r"[{}\[\]\"']")
+
+# Remainder of a string after its opening quote
+_DOUBLE_QUOTED = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SINGLE_QUOTED = re.compile(r"[^'\\]*(?:\\.[^'\\]*)*'", re.DOTALL)
+_BARE_DOUBLE_QUOTE = re.compile(r'(?<!\\)"')
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+_decoder = json.JSONDecoder()
+
+
+def find_plan_object(data: Any) -> Optional[dict]:
+    """Return the outermost object that has a "resources" key"""
+    if isinstance(data, dict):
+        if "resources" in data:
+            return data
+        for value in data.values():
+            found = find_plan_object(value)
+            if found is not None:
+                return found
+    return None
+
+
+def _close(stack: List[str]) -> str:
+    return "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _loads(text: str) -> Optional[dict]:
+    try:
+        return find_plan_object(json.loads(text))
+    except json.JSONDecodeError:
+        return None
+
+
+def _drop_trailing_comma(segment: str) -> str:
+    stripped = segment.rstrip()
+    if stripped.endswith(","):
+        return stripped[:-1] + segment[len(stripped):]
+    return segment
+
+
+def extract_plan_json(content: str) -> Optional[dict]:
+    """Extract the plan object from free-form model output in a single pass.
+
+    Scans for top-level JSON objects while tracking strings and nesting, so prose,
+    code fences and braces inside strings are skipped without backtracking. Valid
+    candidates are decoded directly; others are repaired as they are copied:
+    single-quoted strings become double-quoted and trailing commas before
+    ``}``/``]`` are dropped. A truncated final object is closed after its last
+    complete element. Returns the first object containing ``resources``, or None.
+    """
+    pieces: List[str] = []
+    stack: List[str] = []
+    last = 0  # copy cursor into content
+    safe: Optional[Tuple[int, List[str]]] = None  # last point where the candidate was well-formed
+    unterminated = False
+    pos = 0
+
+    while True:
+        match = _SPECIAL.search(content, pos)
+        if match is None:
+            break
+        i = match.start()
+        char = content[i]
+        pos = i + 1
+
+        if not stack:
+            if char == "{":
+                # Fast path: the candidate is already valid JSON
+                try:
+                    data, end = _decoder.raw_decode(content, i)
+                except json.JSONDecodeError:
+                    pieces = []
+                    stack = ["{"]
+                    last = i
+                    safe = None
+                    continue
+                found = find_plan_object(data)
+                if found is not None:
+                    return found
+                pos = end
+            continue
+
+        if char == '"':
+            string = _DOUBLE_QUOTED.match(content, pos)
+            if string is None:
+                unterminated = True
+                break
+            pos = string.end()
+        elif char == "'":
+            string = _SINGLE_QUOTED.match(content, pos)
+            if string is None:
+                unterminated = True
+                break
+            body = string.group(0)[:-1].replace("\\'", "'")
+            pieces.append(content[last:i])
+            pieces.append('"' + _BARE_DOUBLE_QUOTE.sub('\\\\"', body) + '"')
+            pos = last = string.end()
+        elif char in "{[":
+            stack.append(char)
+        else:
+            stack.pop()
+            pieces.append(_drop_trailing_comma(content[last:i]) + char)
+            last = pos
+            if not stack:
+                found = _loads("".join(pieces))
+                if found is not None:
+                    return found
+            else:
+                safe = (len(pieces), list(stack))
+
+    if not stack:
+        return None
+
+    # Truncated output: keep everything up to the last complete element
+    if safe is not None:
+        count, open_stack = safe
+        found = _loads("".join(pieces[:count]) + _close(open_stack))
+        if found is not None:
+            return found
+
+    # Otherwise close whatever is still open
+    text = "".join(pieces) + content[last:]
+    if unterminated:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return _loads(text + _close(stack))
@@ -0,0 +1,81 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ResourceStreamParser:
+    """Incrementally pull objects out of the top-level "resources" array of a
+    JSON document that arrives in chunks.
+
+    Each character is scanned once; an object is decoded as soon as its closing
+    brace arrives, so callers can forward resources before the document ends.
+    Text outside the outermost object (markdown fences, prose) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []  # open containers: "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None  # key of the value being read in the top-level object
+        self._array_depth: Optional[int] = None  # stack depth of the resources array
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of text and return the resources it completed"""
+        self._text += chunk
+        text = self._text
+        completed = []
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i + 1
+            elif char == ":":
+                if len(self._stack) == 1:
+                    self._key = self._last_string
+            elif char == ",":
+                if len(self._stack) == 1:
+                    self._key = None
+            elif char in "{[":
+                self._stack.append(char)
+                depth = len(self._stack)
+                if char == "[" and depth == 2 and self._key == "resources":
+                    self._array_depth = depth
+                elif char == "{" and self._array_depth is not None and depth == self._array_depth + 1:
+                    self._item_start = i
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                depth = len(self._stack)
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and depth == self._array_depth + 1:
+                    try:
+                        completed.append(json.loads(text[self._item_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+                elif char == "]" and depth == self._array_depth:
+                    self._array_depth = None
+
+        self._pos = len(text)
+        return completed
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._text
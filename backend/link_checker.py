@@ -0,0 +1,161 @@
+import asyncio
+import ipaddress
+import os
+import socket
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# Link checks in flight at once, and per host so no site is hammered
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "32"))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "4"))
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "10"))  # seconds
+LINK_CHECK_USER_AGENT = os.getenv("LINK_CHECK_USER_AGENT", "LearnFlowLinkChecker/1.0")
+LINK_CHECK_MAX_REDIRECTS = int(os.getenv("LINK_CHECK_MAX_REDIRECTS", "10"))
+
+# Hosts reserved for documentation and testing (RFC 2606, RFC 6761): links the model
+# made up rather than found
+FICTIONAL_HOSTS = frozenset(("example.com", "example.org", "example.net", "localhost"))
+FICTIONAL_SUFFIXES = (".example", ".test", ".invalid", ".localhost")
+
+# Responses that mean the page is gone; anything else that is not a success is inconclusive
+DEAD_STATUSES = frozenset((404, 410))
+# Servers that do not implement HEAD (or refuse it) are asked with GET instead
+HEAD_UNSUPPORTED_STATUSES = frozenset((400, 403, 405, 501))
+
+
+def static_status(url: str) -> Optional[str]:
+    """Link status decidable without a request: fictional for reserved hosts, dead for
+    URLs that cannot be fetched at all, None otherwise"""
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower().rstrip(".")
+    except ValueError:
+        return "dead"
+    if parts.scheme not in ("http", "https") or not host:
+        return "dead"
+    if host.startswith("www."):
+        host = host[4:]
+    if host in FICTIONAL_HOSTS or host.endswith(FICTIONAL_SUFFIXES) or any(
+        host.endswith(f".{fictional}") for fictional in FICTIONAL_HOSTS
+    ):
+        return "fictional"
+    return None
+
+
+def classify(status_code: int) -> str:
+    if status_code < 400:
+        return "ok"
+    if status_code in DEAD_STATUSES:
+        return "dead"
+    return "unknown"
+
+
+class Unreachable(Exception):
+    """A link (or a redirect it leads to) that is not requested, with the status to record"""
+
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+class LinkChecker:
+    """Concurrent link checker over one pooled HTTP client.
+
+    Each URL gets a HEAD request (falling back to a GET whose body is not read when HEAD
+    is not supported), following redirects. Returns (status, HTTP status) per URL,
+    where status is ok, dead, fictional or unknown (timeouts, refused connections, 403s,
+    429s, 5xx). Only hosts that do not exist are dead without a response.
+
+    The URLs come from the model, so every host, including redirect targets, must resolve
+    to public addresses only; links to loopback, link-local or private addresses are left
+    unknown without a request (allow_private lifts this, e.g. to check a local server).
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LINK_CHECK_CONCURRENCY,
+        per_host: int = LINK_CHECK_PER_HOST,
+        timeout: float = LINK_CHECK_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        allow_private: bool = False,
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.allow_private = allow_private
+        # Redirects are followed by hand so each target's address is checked first
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=False,
+            headers={"User-Agent": LINK_CHECK_USER_AGENT},
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._addresses: Dict[Tuple[str, int], Optional[str]] = {}  # (host, port) -> status if unreachable
+
+    async def check(self, url: str) -> Tuple[str, Optional[int]]:
+        """Link status and final HTTP status (None without a response) of one URL"""
+        status = static_status(url)
+        if status is not None:
+            return status, None
+        host = urlsplit(url).hostname or ""
+        async with self._hosts.setdefault(host, asyncio.Semaphore(self.per_host)):
+            try:
+                response = await self._fetch("HEAD", url)
+                if response.status_code in HEAD_UNSUPPORTED_STATUSES:
+                    response = await self._fetch("GET", url)
+            except Unreachable as error:
+                return error.status, None
+            except httpx.HTTPError:
+                # Refused connections and timeouts may be temporary
+                return "unknown", None
+        return classify(response.status_code), response.status_code
+
+    async def _fetch(self, method: str, url: str) -> httpx.Response:
+        """Final response to method on url, without reading its body"""
+        request = self._client.build_request(method, url)
+        for _ in range(LINK_CHECK_MAX_REDIRECTS + 1):
+            await self._check_address(request.url)
+            response = await self._client.send(request, stream=True)
+            await response.aclose()
+            if response.next_request is None:
+                return response
+            request = response.next_request
+        raise httpx.TooManyRedirects("Exceeded maximum allowed redirects", request=request)
+
+    async def _check_address(self, url: httpx.URL) -> None:
+        """Raise Unreachable if url's host does not exist (dead), cannot be resolved now
+        or resolves to an address that is not public (unknown)"""
+        if self.allow_private:
+            return
+        port = url.port or (443 if url.scheme == "https" else 80)
+        key = (url.host, port)
+        if key not in self._addresses:
+            try:
+                addresses = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+            except socket.gaierror as error:
+                self._addresses[key] = "dead" if error.errno == socket.EAI_NONAME else "unknown"
+            except UnicodeError:
+                self._addresses[key] = "dead"
+            else:
+                self._addresses[key] = None if all(
+                    ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global for *_, sockaddr in addresses
+                ) else "unknown"
+        status = self._addresses[key]
+        if status is not None:
+            raise Unreachable(status)
+
+    async def check_many(self, urls: Iterable[str]) -> List[Tuple[str, Optional[int]]]:
+        """Check URLs with at most `concurrency` requests in flight, in input order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(url: str) -> Tuple[str, Optional[int]]:
+            async with semaphore:
+                return await self.check(url)
+
+        return await asyncio.gather(*(bounded(url) for url in urls))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -1,20 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
-from enum import Enum
-import requests
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import Annotated, Any, Dict, List, Optional, Sequence, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import httpx
 import json
 import os
 import re
 import logging
+import math
+import time
 from datetime import datetime, timedelta
-import uuid
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 
-app = FastAPI(title="LearnFlow Pathfinder API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open per-worker connections on startup and release them on shutdown"""
+    # Created here rather than at import so every worker process (and event loop)
+    # gets its own upstream connection pool and SQLite connections
+    perplexity_client.connect()
+    plan_cache.connect()
+    warm_cache.connect()
+    plan_store.connect()
+    resource_catalog.connect()
+    job_queue.start()
+    yield
+    await job_queue.close()
+    for task in list(plan_refreshes.values()):
+        task.cancel()
+    await perplexity_client.aclose()
+    plan_cache.close()
+    warm_cache.close()
+    plan_store.close()
+    resource_catalog.close()
+    admission.close()
+
+app = FastAPI(title="LearnFlow Pathfinder API", lifespan=lifespan)
 
 # Add CORS middleware to allow frontend to communicate with backend
 app.add_middleware(
@@ -29,326 +55,967 @@ app.add_middleware(
 from dotenv import load_dotenv
 load_dotenv()
 
+from resilience import CircuitOpenError, ResilientPerplexityClient
+from admission import CLIENT_ID_HEADER, PRIORITY_BATCH, AdmissionController, BudgetExceeded
+from plan_cache import PlanCache, cache_key
+from topic_index import TopicIndex, scope_key
+from warm_cache import WarmCache
+from prompts import PROMPT_PROFILE, RESOURCES_RESPONSE_FORMAT, SYSTEM_PROMPT, prompt_request
+from jobs import JOB_MAX_WAIT, JobError, JobQueue, JobQueueFull, check_callback_url
+from single_flight import SingleFlight
+from json_stream import ResourceStreamParser
+from json_extract import extract_plan_json, find_plan_object
+from rate_limit import TokenBucket
+from scheduler import IsoDates, day_offset, days_needed, parse_iso_date, due_day_offsets, milestone_day_offsets, milestone_resource_indexes
+from plan_store import PlanOwnershipError, PlanStore
+from resource_catalog import ResourceCatalog
+import metrics
+from metrics import stage
+from profiler import PROFILE_REQUESTS, SamplingProfiler
+from models import Resource, Milestone, TopicInputData, LearningPlan, ResourceUpdate, MilestoneUpdate, ReplanRequest, PlanJobRequest
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Record request latency by route and report stage timings in Server-Timing"""
+    spans = metrics.start_trace()
+    profiler = None
+    if PROFILE_REQUESTS and request.query_params.get("profile") == "1":
+        profiler = SamplingProfiler().start()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            elapsed,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=str(status),
+            outcome="ok" if status < 400 else "error",
+        )
+        if profiler is not None:
+            profiler.stop()
+    if spans:
+        response.headers["Server-Timing"] = metrics.server_timing(spans)
+    if profiler is not None:
+        response.headers["X-Profile"] = profiler.dump(request.url.path)
+    return response
+
 # Environment variables
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY", "")
-PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
-
-# Models
-class LearningPreference(str, Enum):
-    VIDEO = "video"
-    TEXT = "text"
-    PROJECT = "project"
-    INTERACTIVE = "interactive"
-    AUDIO = "audio"
-
-class Resource(BaseModel):
-    id: str
-    title: str
-    url: str
-    type: str  # Using string instead of enum for compatibility with frontend
-    description: str
-    estimatedTime: int  # minutes
-    completed: bool = False
-    dueDate: Optional[str] = None
-    rating: Optional[int] = None  # 1-5 rating after completion
-
-class Milestone(BaseModel):
-    id: str
-    title: str
-    description: str
-    targetDate: str
-    completed: bool = False
-    resources: List[str]  # resource IDs
-
-class TopicInputData(BaseModel):
-    topic: str
-    timeframe: int
-    timeframeUnit: Literal["days", "weeks", "months"]
-    knowledgeLevel: Literal["beginner", "intermediate", "advanced"]
-    preferences: List[str]  # Using string instead of enum for compatibility with frontend
-    studyTimePerDay: int
-
-class LearningPlan(BaseModel):
-    id: str
-    title: str
-    topic: str
-    timeframe: int
-    timeframeUnit: Literal["days", "weeks", "months"]
-    knowledgeLevel: Literal["beginner", "intermediate", "advanced"]
-    preferences: List[str]  # Using string instead of enum for compatibility with frontend
-    studyTimePerDay: int
-    resources: List[Resource]
-    milestones: List[Milestone]
-    createdAt: str
-    updatedAt: str
+
+# Shared async upstream client (one keep-alive connection pool per worker)
+perplexity_client = ResilientPerplexityClient(PERPLEXITY_API_KEY)
+
+# Global and per-client budget for upstream calls (shared key, provider rate limit)
+admission = AdmissionController()
+
+# Failures of (or refusals to make) an upstream call
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError, BudgetExceeded)
+
+# Cache of parsed Sonar resources keyed on the normalized request
+plan_cache = PlanCache()
+
+# Plan data precomputed for popular topics, memory-mapped from WARM_CACHE_FILE
+warm_cache = WarmCache()
+
+# Topics of cached plans, for reusing the plan of a near-duplicate topic
+topic_index = TopicIndex()
+
+# Coalesces identical concurrent upstream calls
+plan_flights = SingleFlight()
+
+# Server-side store of generated plans and their progress
+plan_store = PlanStore()
+
+# Distinct resources across plans and the link health recorded by check_links.py
+resource_catalog = ResourceCatalog()
+
+# Batch generation limits
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_RATE_PER_SECOND = float(os.getenv("BATCH_RATE_PER_SECOND", "5"))
+
+# Shared by every batch so concurrent batches stay within one upstream rate
+batch_rate_limiter = TokenBucket(BATCH_RATE_PER_SECOND, BATCH_RATE_PER_SECOND)
+
+# Background refreshes of cache entries close to expiry, per worker and key
+PLAN_REFRESH_MAX_PENDING = int(os.getenv("PLAN_REFRESH_MAX_PENDING", "100"))
+plan_refreshes: Dict[str, asyncio.Task] = {}
+
+# Serializer for plan list responses
+plan_list_adapter = TypeAdapter(List[LearningPlan])
 
 # Helper functions
 def generate_id() -> str:
     """Generate a unique ID"""
-    return str(uuid.uuid4())[:15]
+    # Same shape as the first 15 characters of a UUID4, without building the UUID
+    random_hex = os.urandom(6).hex()
+    return f"{random_hex[:8]}-{random_hex[8:]}-4"
 
-def distribute_resources_over_time(resources: List[Resource], start_date: datetime, end_date: datetime) -> List[Resource]:
-    """Distribute resources over the timeframe"""
+def schedule_resources(resources: List[Resource], start_date: datetime, end_date: datetime, study_time_per_day: Optional[float] = None) -> Tuple[List[Resource], Sequence[int]]:
+    """Assign due dates weighted by estimated time; also return the due day offsets"""
     total_days = (end_date - start_date).days
-    days_per_resource = max(1, total_days // len(resources))
+    offsets = due_day_offsets([resource.estimatedTime for resource in resources], total_days, study_time_per_day)
     
-    distributed_resources = []
-    for i, resource in enumerate(resources):
-        due_date = start_date + timedelta(days=i * days_per_resource)
-        
-        # Make sure the last resources don't go past the end date
-        if due_date > end_date:
-            due_date = end_date
-        
-        resource_dict = resource.dict()
-        resource_dict.pop("dueDate", None)
-        distributed_resources.append(
-            Resource(
-                **resource_dict,
-                dueDate=due_date.isoformat()
-            )
-        )
-    
-    return distributed_resources
+    # Only materialize ISO strings at the edge, once per distinct day
+    iso_dates = IsoDates(start_date)
+    scheduled = [
+        resource.model_copy(update={"dueDate": iso_dates[offset]})
+        for resource, offset in zip(resources, offsets)
+    ]
+    return scheduled, offsets
+
+def distribute_resources_over_time(resources: List[Resource], start_date: datetime, end_date: datetime, study_time_per_day: Optional[float] = None) -> List[Resource]:
+    """Distribute resources over the timeframe, weighted by their estimated time"""
+    return schedule_resources(resources, start_date, end_date, study_time_per_day)[0]
 
-def create_milestones(resources: List[Resource], start_date: datetime, end_date: datetime) -> List[Milestone]:
+def create_milestones(resources: List[Resource], start_date: datetime, end_date: datetime, due_offsets: Optional[Sequence[int]] = None) -> List[Milestone]:
     """Create milestones based on resources and timeframe"""
     total_days = (end_date - start_date).days
-    milestone_count = max(1, total_days // 7)  # One milestone per week approximately
-    days_per_milestone = total_days // milestone_count
+    milestone_offsets = milestone_day_offsets(total_days)
     
-    milestones = []
+    # Parse each due date at most once (callers that just scheduled the resources pass the offsets)
+    if due_offsets is None:
+        due_offsets = [day_offset(start_date, resource.dueDate) for resource in resources]
     
-    for i in range(milestone_count):
-        milestone_date = start_date + timedelta(days=(i + 1) * days_per_milestone)
-        
-        # Get resources that should be completed by this milestone
-        resources_for_milestone = []
-        for resource in resources:
-            if resource.dueDate:
-                resource_date = datetime.fromisoformat(resource.dueDate)
-                if resource_date <= milestone_date:
-                    resources_for_milestone.append(resource)
-        
-        # Get up to 3 most recent resources
-        resource_ids = [r.id for r in resources_for_milestone[-3:]] if resources_for_milestone else []
-        
-        milestones.append(
-            Milestone(
-                id=generate_id(),
-                title=f"Milestone {i + 1}",
-                description="Complete key resources and test your understanding",
-                targetDate=milestone_date.isoformat(),
-                completed=False,
-                resources=resource_ids
-            )
-        )
+    # Get up to 3 most recent resources that should be completed by each milestone
+    assigned = milestone_resource_indexes(due_offsets, milestone_offsets)
     
-    return milestones
+    iso_dates = IsoDates(start_date)
+    return [
+        Milestone(
+            id=generate_id(),
+            title=f"Milestone {i + 1}",
+            description="Complete key resources and test your understanding",
+            targetDate=iso_dates[milestone_offset],
+            completed=False,
+            resources=[resources[index].id for index in indexes]
+        )
+        for i, (milestone_offset, indexes) in enumerate(zip(milestone_offsets, assigned))
+    ]
 
-# API endpoints
-@app.post("/api/generate-plan", response_model=LearningPlan)
-async def generate_plan(input_data: TopicInputData):
-    """Generate a learning plan using Perplexity Sonar models"""
-    global re
+def client_id(request: Request) -> str:
+    """Identity that per-client upstream quotas are charged to.
+
+    The CLIENT_ID_HEADER header (e.g. an API key set by an authenticating proxy) when
+    configured and present, else the client IP.
+    """
+    if CLIENT_ID_HEADER:
+        value = request.headers.get(CLIENT_ID_HEADER)
+        if value:
+            return "key:" + hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+    return f"ip:{request.client.host}" if request.client else ""
+
+def check_api_key() -> None:
+    """Validate that the Perplexity API key is configured and well-formed"""
     if not PERPLEXITY_API_KEY:
         raise HTTPException(status_code=500, detail="Perplexity API key not configured")
 
     # Validate API key format
     if not re.match(r'^pplx-[A-Za-z0-9]{32,}$', PERPLEXITY_API_KEY):
         raise HTTPException(status_code=500, detail="Invalid Perplexity API key format")
+
+def build_sonar_payload(input_data: TopicInputData, profile: str = PROMPT_PROFILE) -> dict:
+    """Build the chat completion request body for Perplexity API"""
+    with stage("prompt_build"):
+        prompt, max_tokens, response_format = prompt_request(input_data, profile)
+    return {
+        "model": "sonar",  # Changed to sonar for concise, JSON-only output
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "response_format": response_format
+    }
+
+def parse_plan_content(content: str) -> dict:
+    """Parse the plan JSON out of the model's message content"""
+    # Parse the JSON from the content
+    # Note: The content might include markdown or other text, so we need to extract just the JSON part
+    plan_data = None
+    
+    # First attempt: Try to parse the entire content as JSON
+    try:
+        plan_data = find_plan_object(json.loads(content))
+        # Check if resources exist in the parsed data
+        if plan_data is None:
+            logger.error(f"No resources found in parsed JSON: {content}")
+            metrics.PLAN_PARSE.inc(path="failed")
+            raise HTTPException(status_code=502, detail="No resources found in AI response")
+        metrics.PLAN_PARSE.inc(path="direct")
+    except json.JSONDecodeError as e:
+        logger.info(f"Could not parse entire content as JSON, trying to extract JSON part. Error: {str(e)}")
+        
+        # Second attempt: Scan for the outermost object containing resources, repairing common issues
+        plan_data = extract_plan_json(content)
+        if plan_data is None:
+            logger.error(f"No valid JSON structure found in API response: {content}")
+            metrics.PLAN_PARSE.inc(path="failed")
+            raise HTTPException(status_code=502, detail="No valid JSON structure found in AI response")
+        metrics.PLAN_PARSE.inc(path="fallback")
+    
+    if not plan_data:
+        raise HTTPException(status_code=502, detail="Failed to extract valid data from AI response")
+    check_resources(plan_data.get("resources", []))
+    return plan_data
+
+def check_resources(resources: Any) -> None:
+    """Reject parsed resources that are not a list of objects with string URLs"""
+    if not isinstance(resources, list) or not all(
+        isinstance(resource_data, dict) and isinstance(resource_data.get("url", ""), str)
+        for resource_data in resources
+    ):
+        logger.error(f"Malformed resources in API response: {resources!r}")
+        raise HTTPException(status_code=502, detail="Malformed resources in AI response")
+
+async def fetch_plan_data(input_data: TopicInputData) -> dict:
+    """Call Perplexity API and return the parsed plan data (before scheduling)"""
+    payload = build_sonar_payload(input_data)
+    with stage("upstream"):
+        response = await perplexity_client.chat_completion(payload)
+    
+    # Store raw response for debugging
+    raw_response = response.text
+    
+    try:
+        result = response.json()
+    except json.JSONDecodeError:
+        logger.error(f"Perplexity API returned invalid JSON: {raw_response}")
+        raise HTTPException(status_code=502, detail="Invalid response format from AI provider")
     
-    # Prepare the prompt for Perplexity API
+    # Extract the content from the response
+    try:
+        content = result["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        content = None
+    if not isinstance(content, str):
+        logger.error(f"Perplexity API returned an unexpected response: {raw_response}")
+        raise HTTPException(status_code=502, detail="Invalid response format from AI provider")
+    
+    metrics.record_usage(result.get("usage"))
+    
+    with stage("parse"):
+        return parse_plan_content(content)
+
+async def fetch_and_cache_plan_data(input_data: TopicInputData, key: str, limiter: Optional[TokenBucket] = None, client: str = "") -> dict:
+    """Fetch plan data from Perplexity API and store its resources in the cache.
+
+    Runs once per single flight, so only the request that starts the call is charged
+    to ``client``'s quota; identical requests joining it are not.
+    """
+    if limiter is not None:
+        # Batch calls are paced by their own limiter, wait for the client's quota and
+        # queue behind interactive ones
+        await limiter.acquire()
+        await admission.admit(client, PRIORITY_BATCH, bounded=False)
+    else:
+        await admission.admit(client)
+    plan_data = await fetch_plan_data(input_data)
+    plan_cache.set(key, {"resources": plan_data.get("resources", [])})
+    topic_index.add(input_data, key)
+    return plan_data
+
+async def refresh_plan_data(input_data: TopicInputData, key: str) -> None:
+    """Regenerate a cache entry at batch priority, within the upstream budgets"""
+    try:
+        await plan_flights.do(key, lambda: fetch_and_cache_plan_data(input_data, key, batch_rate_limiter))
+    except (*UPSTREAM_ERRORS, HTTPException) as e:
+        # The entry keeps being served until it expires; the next hit retries
+        logger.warning(f"Background refresh of the plan for {input_data.topic!r} failed: {e}")
+
+def schedule_refresh(input_data: TopicInputData, key: str) -> None:
+    """Start refreshing a cache entry in the background unless it already is"""
+    if key in plan_refreshes or len(plan_refreshes) >= PLAN_REFRESH_MAX_PENDING:
+        return
+    task = asyncio.ensure_future(refresh_plan_data(input_data, key))
+    plan_refreshes[key] = task
+    task.add_done_callback(lambda _: plan_refreshes.pop(key, None))
+
+def serve_cache_entry(input_data: TopicInputData, key: str, entry: Tuple[dict, float]) -> dict:
+    """Plan data of a cache hit, refreshing it in the background when it is about to expire
+    (or already has: stale-while-revalidate)"""
+    plan_data, expires_at = entry
+    if plan_cache.needs_refresh(expires_at):
+        schedule_refresh(input_data, key)
+    return plan_data
+
+def get_cached_plan_data(input_data: TopicInputData, key: str) -> Optional[dict]:
+    """Cached plan data for the request, or for the most similar earlier topic in its scope.
+
+    Looks in the plan cache, then the warm file, then at similar topics of cached plans
+    and finally at warm plans of the same core topic and scope.
+    """
+    entry = plan_cache.get_entry(key) or warm_cache.get(key, plan_cache.stale_while_revalidate)
+    if entry is not None:
+        return serve_cache_entry(input_data, key, entry)
+    match = topic_index.lookup(input_data)
+    if match is not None:
+        similar_key, score = match
+        plan_data = plan_cache.get(similar_key)
+        if plan_data is not None:
+            logger.debug(f"Reusing plan of a similar topic for {input_data.topic!r} (similarity {score:.2f})")
+            return plan_data
+        topic_index.discard(similar_key)
+    if topic_index.enabled:
+        entry = warm_cache.get(scope_key(input_data), plan_cache.stale_while_revalidate)
+        if entry is not None:
+            return serve_cache_entry(input_data, key, entry)
+    return None
+
+def get_stale_plan_data(key: str) -> Optional[dict]:
+    """Expired plan data to serve while the upstream is unavailable"""
+    plan_data = plan_cache.get(key, allow_stale=True)
+    if plan_data is None:
+        entry = warm_cache.get(key, plan_cache.stale_ttl)
+        plan_data = entry[0] if entry is not None else None
+    return plan_data
+
+def get_end_date(input_data: TopicInputData, start_date: datetime) -> datetime:
+    """Calculate the plan end date from the requested timeframe"""
+    if input_data.timeframeUnit == "days":
+        return start_date + timedelta(days=input_data.timeframe)
+    elif input_data.timeframeUnit == "weeks":
+        return start_date + timedelta(days=input_data.timeframe * 7)
+    # Approximate a month as 30 days
+    return start_date + timedelta(days=input_data.timeframe * 30)
+
+def make_resource(resource_data: dict, input_data: TopicInputData) -> Resource:
+    """Create a resource with a fresh ID from parsed resource data, linked to its catalog entry"""
+    entry = resource_catalog.register(resource_data)
+    title = resource_data.get("title", "Untitled Resource")
+    resource_type = resource_data.get("type", input_data.preferences[0] if input_data.preferences else "text")
+    if entry is not None:
+        # Share the catalog's interned strings between the many copies of a resource
+        title = entry.title if entry.title == title else title
+        resource_type = entry.type if entry.type == resource_type else resource_type
+    return Resource(
+        id=generate_id(),
+        title=title,
+        url=resource_data.get("url", "https://example.com"),
+        type=resource_type,
+        description=resource_data.get("description", "No description provided"),
+        estimatedTime=resource_data.get("estimatedTime", 60),
+        completed=False,
+        catalogId=entry.id if entry is not None else None,
+    )
+
+def assemble_learning_plan(input_data: TopicInputData, resources: List[Resource]) -> LearningPlan:
+    """Schedule resources and assemble a learning plan around them"""
+    # Calculate start and end dates
+    start_date = datetime.now()
+    end_date = get_end_date(input_data, start_date)
+    
+    with stage("schedule"):
+        # Distribute resources over time
+        distributed_resources, due_offsets = schedule_resources(resources, start_date, end_date, input_data.studyTimePerDay)
+        
+        # Create milestones
+        milestones = create_milestones(distributed_resources, start_date, end_date, due_offsets)
+    
+    # Create the learning plan
+    learning_plan = LearningPlan(
+        id=generate_id(),
+        title=f"{input_data.topic} Learning Plan",
+        topic=input_data.topic,
+        timeframe=input_data.timeframe,
+        timeframeUnit=input_data.timeframeUnit,
+        knowledgeLevel=input_data.knowledgeLevel,
+        preferences=input_data.preferences,
+        studyTimePerDay=input_data.studyTimePerDay,
+        resources=distributed_resources,
+        milestones=milestones,
+        createdAt=datetime.now().isoformat(),
+        updatedAt=datetime.now().isoformat()
+    )
+    
+    return learning_plan
+
+def build_learning_plan(input_data: TopicInputData, plan_data: dict) -> LearningPlan:
+    """Schedule parsed resources and assemble a fresh learning plan"""
+    # Create resources with IDs
+    resources = [make_resource(resource_data, input_data) for resource_data in resource_catalog.live(plan_data.get("resources", []))]
+    return assemble_learning_plan(input_data, resources)
+
+def replan_learning_plan(
+    plan: LearningPlan,
+    end_date: Optional[datetime] = None,
+    study_time_per_day: Optional[int] = None,
+    extra_resources: Optional[List[Resource]] = None,
+) -> LearningPlan:
+    """Reschedule only the unfinished resources of a plan, starting today.
+
+    Completed resources and milestones are kept as they are. Unfinished resources (and
+    any extra ones, appended at the end) get new due dates and milestones up to end_date.
+    Without an end_date, a new study_time_per_day or a plan whose end date has passed
+    ends once the remaining estimated time is covered at the daily study time.
+    """
+    start_date = datetime.now()
+    created_at = parse_iso_date(plan.createdAt)
+    extra_resources = extra_resources or []
+    pending = [resource for resource in plan.resources if not resource.completed] + extra_resources
+    
+    if end_date is None:
+        end_date = get_end_date(plan, created_at)
+        if study_time_per_day or end_date <= start_date:
+            days = days_needed([resource.estimatedTime for resource in pending], study_time_per_day or plan.studyTimePerDay)
+            if days is None:
+                # No daily study time to size it by: restart the original timeframe today
+                days = max(1, (end_date - created_at).days)
+            end_date = start_date + timedelta(days=days)
+    end_date = max(end_date, start_date)
+    study_time_per_day = study_time_per_day or plan.studyTimePerDay
+    
+    scheduled, due_offsets = schedule_resources(pending, start_date, end_date, study_time_per_day)
+    rescheduled = {resource.id: resource for resource in scheduled}
+    resources = [rescheduled.get(resource.id, resource) for resource in plan.resources]
+    resources += scheduled[len(scheduled) - len(extra_resources):]
+    
+    # Keep finished milestones and number the new ones after them
+    finished = [milestone for milestone in plan.milestones if milestone.completed]
+    milestones = finished + [
+        milestone.model_copy(update={"title": f"Milestone {len(finished) + i + 1}"})
+        for i, milestone in enumerate(create_milestones(scheduled, start_date, end_date, due_offsets))
+    ]
+    
+    update = {
+        "resources": resources,
+        "milestones": milestones,
+        "studyTimePerDay": study_time_per_day,
+        "updatedAt": datetime.now().isoformat(),
+    }
+    if end_date != get_end_date(plan, created_at):
+        update["timeframe"] = (end_date - created_at).days
+        update["timeframeUnit"] = "days"
+    return plan.model_copy(update=update)
+
+async def fetch_extra_resources(plan: LearningPlan, count: int) -> List[Resource]:
+    """Ask Perplexity API for a few resources that complement an existing plan"""
+    existing = "\n".join(f"- {resource.title}" for resource in plan.resources)
     prompt = f"""
-    Create a detailed learning plan for the topic: {input_data.topic}.
-    
-    User's knowledge level: {input_data.knowledgeLevel}
-    Timeframe: {input_data.timeframe} {input_data.timeframeUnit}
-    Learning preferences: {', '.join(input_data.preferences)}
-    Study time per day: {input_data.studyTimePerDay} hours
-    
-    Please provide a structured learning plan with the following components:
-    1. A list of 5-10 learning resources including:
-       - Title
-       - URL (can be fictional but realistic)
-       - Type (matching user preferences: {', '.join(input_data.preferences)})
-       - Description (1-2 sentences)
-       - Estimated time to complete (in minutes)
-    
-    Format the response as a JSON object with the following structure:
-    {{
-      "resources": [
-        {{
-          "title": "Resource title",
-          "url": "https://example.com/resource",
-          "type": "one of: video, text, project, interactive, audio",
-          "description": "Brief description of the resource",
-          "estimatedTime": time_in_minutes
-        }}
-      ]
-    }}
+    Suggest {count} additional learning resources for the topic: {plan.topic}.
+    
+    User's knowledge level: {plan.knowledgeLevel}
+    Learning preferences: {', '.join(plan.preferences)}
+    
+    The learner already has these resources, do not repeat them:
+    {existing}
+    
+    Return a JSON object with a "resources" array; each resource has title, url, type,
+    description (1-2 sentences) and estimatedTime (in minutes).
     """
+    with stage("upstream"):
+        response = await perplexity_client.chat_completion({
+            "model": "sonar",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 300 * count,
+            "response_format": RESOURCES_RESPONSE_FORMAT
+        })
     
-    # Call Perplexity API
     try:
-        response = requests.post(
-            PERPLEXITY_API_URL,
-            headers={
-                "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "sonar",  # Changed to sonar for concise, JSON-only output
-                "messages": [
-                    {"role": "system", "content": "You are a helpful AI assistant that creates personalized learning plans."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 2000,
-                "response_format": {
-                    "type": "json_schema",
-                    "json_schema": {
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "resources": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "object",
-                                        "properties": {
-                                            "title": {"type": "string"},
-                                            "url": {"type": "string"},
-                                            "type": {"type": "string"},
-                                            "description": {"type": "string"},
-                                            "estimatedTime": {"type": "integer"}
-                                        },
-                                        "required": ["title", "url", "type", "description", "estimatedTime"]
-                                    }
-                                }
-                            },
-                            "required": ["resources"]
-                        }
-                    }
-                }
-            }
-        )
-        
-        response.raise_for_status()
-        
-        # Store raw response for debugging
-        raw_response = response.text
-        
-        try:
-            result = response.json()
-        except json.JSONDecodeError:
-            logger.error(f"Perplexity API returned invalid JSON: {raw_response}")
-            raise HTTPException(status_code=502, detail="Invalid response format from AI provider")
-        
-        # Extract the content from the response
+        result = response.json()
         content = result["choices"][0]["message"]["content"]
+    except (json.JSONDecodeError, KeyError, IndexError):
+        logger.error(f"Perplexity API returned an unexpected response: {response.text}")
+        raise HTTPException(status_code=502, detail="Invalid response format from AI provider")
+    
+    metrics.record_usage(result.get("usage"))
+    plan_data = parse_plan_content(content)
+    return [make_resource(resource_data, plan) for resource_data in resource_catalog.live(plan_data.get("resources", []))[:count]]
+
+def json_response(content: Any) -> Response:
+    """Serialize a model (or list of plans) straight to JSON.
+
+    Endpoints return this instead of the model so FastAPI skips re-validating and
+    re-encoding it through ``response_model``; the bytes are the same.
+    """
+    if isinstance(content, list):
+        body = plan_list_adapter.dump_json(content)
+    else:
+        body = content.model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+def upstream_error(error: Exception) -> HTTPException:
+    """HTTP error for a failed Perplexity call.
+
+    429 with Retry-After when the upstream budget is used up, 503 with Retry-After
+    while the circuit is open, else 500.
+    """
+    if isinstance(error, BudgetExceeded):
+        return HTTPException(
+            status_code=429,
+            detail="Too many plan generation requests, please retry later",
+            headers={"Retry-After": str(math.ceil(error.retry_after))},
+        )
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="Perplexity API is temporarily unavailable",
+            headers={"Retry-After": str(int(error.retry_after))},
+        )
+    return HTTPException(status_code=500, detail=f"Error calling Perplexity API: {str(error)}")
+
+def plan_event(event: str, data: dict) -> str:
+    """Encode one NDJSON stream event"""
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+async def stream_plan_events(input_data: TopicInputData, owner: str = "", client: str = ""):
+    """Yield a resource event per parsed resource, then the scheduled plan"""
+    key = cache_key(input_data)
+    resources = []
+    
+    try:
+        cached = get_cached_plan_data(input_data, key)
+        if cached is None and plan_flights.pending(key):
+            # Join an identical in-flight generation instead of making (and being charged for) another call
+            try:
+                cached = await plan_flights.do(key, lambda: fetch_and_cache_plan_data(input_data, key, client=client))
+            except UPSTREAM_ERRORS:
+                cached = get_stale_plan_data(key)
+                if cached is None:
+                    raise
+        if cached is not None:
+            for resource_data in resource_catalog.live(cached.get("resources", [])):
+                resource = make_resource(resource_data, input_data)
+                resources.append(resource)
+                yield plan_event("resource", resource.model_dump())
+        else:
+            parser = ResourceStreamParser()
+            resources_data = []
+            stale = None
+            payload = build_sonar_payload(input_data)
+            try:
+                await admission.admit(client)
+                with stage("upstream_stream"):
+                    async for chunk in perplexity_client.stream_chat_completion(payload):
+                        parsed = parser.feed(chunk)
+                        check_resources(parsed)
+                        resources_data.extend(parsed)
+                        for resource_data in resource_catalog.live(parsed):
+                            resource = make_resource(resource_data, input_data)
+                            resources.append(resource)
+                            yield plan_event("resource", resource.model_dump())
+                if resources_data:
+                    metrics.PLAN_PARSE.inc(path="stream")
+            except UPSTREAM_ERRORS:
+                # Serve an expired plan if the upstream fails before anything was sent
+                stale = None if resources else get_stale_plan_data(key)
+                if stale is None:
+                    raise
+                resources_data = stale.get("resources", [])
+                for resource_data in resource_catalog.live(resources_data):
+                    resource = make_resource(resource_data, input_data)
+                    resources.append(resource)
+                    yield plan_event("resource", resource.model_dump())
+            
+            # Fall back to parsing the complete content if nothing could be streamed
+            if not resources_data:
+                resources_data = parse_plan_content(parser.text).get("resources", [])
+                for resource_data in resource_catalog.live(resources_data):
+                    resource = make_resource(resource_data, input_data)
+                    resources.append(resource)
+                    yield plan_event("resource", resource.model_dump())
+            
+            if stale is None:
+                plan_cache.set(key, {"resources": resources_data})
+                topic_index.add(input_data, key)
         
-        # Parse the JSON from the content
-        # Note: The content might include markdown or other text, so we need to extract just the JSON part
-        plan_data = None
-        
-        # First attempt: Try to parse the entire content as JSON
+        learning_plan = assemble_learning_plan(input_data, resources)
+        plan_store.save(learning_plan, owner)
+        yield plan_event("plan", learning_plan.model_dump())
+    except UPSTREAM_ERRORS as e:
+        error = upstream_error(e)
+        yield plan_event("error", {"status": error.status_code, "detail": error.detail})
+    except HTTPException as e:
+        yield plan_event("error", {"status": e.status_code, "detail": e.detail})
+
+async def get_plan_data(input_data: TopicInputData, limiter: Optional[TokenBucket] = None, client: str = "") -> dict:
+    """Return parsed plan data from the cache or a (shared) Perplexity API call.
+
+    A cache miss that starts an upstream call is charged to ``client``'s quota.
+    """
+    # Serve identical (or near-duplicate) requests from the cache; dates and IDs are still generated per plan
+    key = cache_key(input_data)
+    plan_data = get_cached_plan_data(input_data, key)
+    
+    if plan_data is None:
+        # Call Perplexity API, sharing one call between identical concurrent requests
         try:
-            plan_data = json.loads(content)
-            # Check if resources exist in the parsed data
-            if "resources" not in plan_data:
-                logger.error(f"No resources found in parsed JSON: {plan_data}")
-                raise HTTPException(status_code=502, detail="No resources found in AI response")
-        except json.JSONDecodeError as e:
-            logger.info(f"Could not parse entire content as JSON, trying to extract JSON part. Error: {str(e)}")
-            
-            # Second attempt: Try to extract JSON using regex
+            plan_data = await plan_flights.do(key, lambda: fetch_and_cache_plan_data(input_data, key, limiter, client))
+        except UPSTREAM_ERRORS as e:
+            # Degrade to an expired cached plan rather than failing outright
+            plan_data = get_stale_plan_data(key)
+            if plan_data is None:
+                raise upstream_error(e)
+    
+    return plan_data
+
+async def generate_plans_batch(
+    inputs: List[TopicInputData],
+    concurrency: int = BATCH_MAX_CONCURRENCY,
+    limiter: Optional[TokenBucket] = None,
+    client: str = "",
+):
+    """Generate plans for many inputs, yielding (index, LearningPlan or HTTPException) as each completes.
+
+    Identical inputs share one upstream call. At most ``concurrency`` upstream calls run
+    at once and each waits for a token from ``limiter`` (the shared batch limiter by default)
+    and from ``client``'s quota.
+    """
+    limiter = limiter or batch_rate_limiter
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    # Group indexes by normalized input so duplicates are generated once
+    groups: Dict[str, List[int]] = {}
+    for index, input_data in enumerate(inputs):
+        groups.setdefault(cache_key(input_data), []).append(index)
+    
+    async def run(indexes: List[int]):
+        async with semaphore:
             try:
-                import re
-                # Look for JSON pattern with more flexible matching
-                json_match = re.search(r'\{[\s\S]*?"resources"[\s\S]*?\}', content)
-                if json_match:
-                    json_text = json_match.group(0)
-                    # Remove any markdown code block markers
-                    json_text = re.sub(r'```json|```', '', json_text)
-                    # Fix common JSON formatting issues
-                    json_text = json_text.replace("\'", "\"")  # Replace single quotes with double quotes
-                    json_text = re.sub(r',\s*\}', '}', json_text)  # Remove trailing commas
-                    
-                    try:
-                        plan_data = json.loads(json_text.strip())
-                        if "resources" not in plan_data:
-                            logger.error(f"No resources found in extracted JSON: {plan_data}")
-                            raise HTTPException(status_code=502, detail="No resources found in AI response")
-                    except json.JSONDecodeError as e2:
-                        logger.error(f"Failed to parse extracted JSON. Error: {str(e2)}\nExtracted text: {json_text}")
-                        raise HTTPException(status_code=502, detail=f"Failed to parse learning plan response: {str(e2)}")
-                else:
-                    logger.error(f"No JSON-like structure found in API response: {content}")
-                    raise HTTPException(status_code=502, detail="No valid JSON structure found in AI response")
+                return indexes, await get_plan_data(inputs[indexes[0]], limiter, client), None
+            except HTTPException as e:
+                return indexes, None, e
             except Exception as e:
-                logger.error(f"Error during JSON extraction: {str(e)}\nFull content: {content}")
-                raise HTTPException(status_code=502, detail=f"Error processing AI response: {str(e)}")
-        
-        if not plan_data:
-            raise HTTPException(status_code=502, detail="Failed to extract valid data from AI response")
-        
-        # Calculate start and end dates
-        start_date = datetime.now()
-        end_date = start_date
-        
-        if input_data.timeframeUnit == "days":
-            end_date += timedelta(days=input_data.timeframe)
-        elif input_data.timeframeUnit == "weeks":
-            end_date += timedelta(days=input_data.timeframe * 7)
-        elif input_data.timeframeUnit == "months":
-            # Approximate a month as 30 days
-            end_date += timedelta(days=input_data.timeframe * 30)
-        
-        # Create resources with IDs
-        resources = []
-        for resource_data in plan_data.get("resources", []):
-            resources.append(
-                Resource(
-                    id=generate_id(),
-                    title=resource_data.get("title", "Untitled Resource"),
-                    url=resource_data.get("url", "https://example.com"),
-                    type=resource_data.get("type", input_data.preferences[0] if input_data.preferences else "text"),
-                    description=resource_data.get("description", "No description provided"),
-                    estimatedTime=resource_data.get("estimatedTime", 60),
-                    completed=False
-                )
-            )
-        
-        # Distribute resources over time
-        distributed_resources = distribute_resources_over_time(resources, start_date, end_date)
-        
-        # Create milestones
-        milestones = create_milestones(distributed_resources, start_date, end_date)
-        
-        # Create the learning plan
-        learning_plan = LearningPlan(
-            id=generate_id(),
-            title=f"{input_data.topic} Learning Plan",
-            topic=input_data.topic,
-            timeframe=input_data.timeframe,
-            timeframeUnit=input_data.timeframeUnit,
-            knowledgeLevel=input_data.knowledgeLevel,
-            preferences=input_data.preferences,
-            studyTimePerDay=input_data.studyTimePerDay,
-            resources=distributed_resources,
-            milestones=milestones,
-            createdAt=datetime.now().isoformat(),
-            updatedAt=datetime.now().isoformat()
+                # One bad item must not end the stream for the others
+                logger.exception(f"Batch item {inputs[indexes[0]].topic!r} failed")
+                return indexes, None, HTTPException(status_code=500, detail=f"Error generating plan: {str(e)}")
+    
+    tasks = [asyncio.ensure_future(run(indexes)) for indexes in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, plan_data, error = await next_done
+            for index in indexes:
+                if error is not None:
+                    yield index, error
+                    continue
+                try:
+                    yield index, build_learning_plan(inputs[index], plan_data)
+                except ValidationError as e:
+                    yield index, HTTPException(status_code=502, detail=f"Invalid resource in AI response: {str(e)}")
+                except Exception as e:
+                    logger.exception(f"Building the plan of batch item {index} failed")
+                    yield index, HTTPException(status_code=500, detail=f"Error building plan: {str(e)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_batch_events(items: List[Dict[str, Any]], concurrency: int, owner: str = "", client: str = ""):
+    """Yield one plan or error event per batch item, in completion order"""
+    inputs = []
+    positions = []
+    for index, item in enumerate(items):
+        try:
+            inputs.append(TopicInputData.model_validate(item))
+            positions.append(index)
+        except ValidationError as e:
+            yield plan_event("error", {"index": index, "status": 422, "detail": json.loads(e.json(include_url=False))})
+    
+    async for position, result in generate_plans_batch(inputs, concurrency, client=client):
+        index = positions[position]
+        if isinstance(result, HTTPException):
+            yield plan_event("error", {"index": index, "status": result.status_code, "detail": result.detail})
+        else:
+            plan_store.save(result, owner)
+            yield plan_event("plan", {"index": index, "plan": result.model_dump()})
+    
+    yield plan_event("done", {"count": len(items)})
+
+async def run_plan_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate and store the plan of a background job, returning it as its result"""
+    input_data = TopicInputData(**payload["input"])
+    try:
+        plan_data = await get_plan_data(input_data, client=payload["client"])
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    learning_plan = build_learning_plan(input_data, plan_data)
+    with stage("store"):
+        plan_store.save(learning_plan, payload["owner"])
+    return learning_plan.model_dump()
+
+# Background plan generation, bounded separately from request handling
+job_queue = JobQueue(run_plan_job)
+
+# API endpoints
+@app.post("/api/generate-plan", response_model=LearningPlan)
+async def generate_plan(input_data: TopicInputData, x_user_id: Annotated[str, Header()] = "", client: str = Depends(client_id)):
+    """Generate a learning plan using Perplexity Sonar models"""
+    check_api_key()
+    plan_data = await get_plan_data(input_data, client=client)
+    learning_plan = build_learning_plan(input_data, plan_data)
+    with stage("store"):
+        plan_store.save(learning_plan, x_user_id)
+    with stage("serialize"):
+        return json_response(learning_plan)
+
+@app.post("/api/generate-plans")
+async def generate_plans(
+    items: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    x_user_id: Annotated[str, Header()] = "",
+    client: str = Depends(client_id),
+):
+    """Generate learning plans for a batch of TopicInputData items.
+
+    Streams NDJSON events as items complete: ``plan`` (with ``index`` and ``plan``) or
+    ``error`` (with ``index``, ``status`` and ``detail``), then a final ``done`` event.
+    """
+    check_api_key()
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    concurrency = min(concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    return StreamingResponse(stream_batch_events(items, max(1, concurrency), x_user_id, client), media_type="application/x-ndjson")
+
+@app.post("/api/generate-plan/stream")
+async def generate_plan_stream(input_data: TopicInputData, x_user_id: Annotated[str, Header()] = "", client: str = Depends(client_id)):
+    """Stream a learning plan as NDJSON events while Perplexity generates it.
+
+    Emits one ``resource`` event per resource as soon as it is parsed, then a final
+    ``plan`` event carrying the scheduled due dates and milestones (or an ``error`` event).
+    """
+    check_api_key()
+    return StreamingResponse(stream_plan_events(input_data, x_user_id, client), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_plan_job(
+    request: PlanJobRequest,
+    response: Response,
+    x_user_id: Annotated[str, Header()] = "",
+    client: str = Depends(client_id),
+):
+    """Start generating a learning plan in the background and return the queued job.
+
+    Fetch the result from ``GET /api/jobs/{job_id}`` (optionally long-polling with
+    ``wait``), or pass ``callbackUrl`` to have the finished job POSTed to it.
+    """
+    check_api_key()
+    if request.callbackUrl:
+        try:
+            await check_callback_url(request.callbackUrl)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    payload = {
+        "input": request.model_dump(exclude={"callbackUrl"}),
+        "owner": x_user_id,
+        "client": client,
+    }
+    try:
+        job = await job_queue.submit(payload, request.callbackUrl)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many queued plan jobs, please retry later",
+            headers={"Retry-After": "30"},
         )
-        
-        return learning_plan
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return job
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    """Background job worker pool and queue counters"""
+    return job_queue.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=JOB_MAX_WAIT)):
+    """Get a background job with its plan (or error) once finished.
+
+    With ``wait`` (seconds) the request is held until the job finishes or the time is up.
+    """
+    job = await job_queue.wait(job_id, wait) if wait else job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/plans", response_model=LearningPlan)
+async def save_plan(plan: LearningPlan, x_user_id: Annotated[str, Header()] = ""):
+    """Save (or replace) a complete learning plan"""
+    for name, items in (("Resource", plan.resources), ("Milestone", plan.milestones)):
+        if len({item.id for item in items}) != len(items):
+            raise HTTPException(status_code=422, detail=f"{name} ids must be unique within a plan")
+    try:
+        plan_store.save(plan, x_user_id)
+    except PlanOwnershipError:
+        raise HTTPException(status_code=403, detail="Plan belongs to another user")
+    return json_response(plan)
+
+@app.get("/api/plans", response_model=List[LearningPlan])
+async def list_plans(
+    topic: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    beforeId: Optional[str] = None,
+    x_user_id: Annotated[str, Header()] = "",
+):
+    """List the caller's plans, most recently updated first.
+
+    Pass the ``updatedAt`` and ``id`` of the last plan of a page as ``before`` and
+    ``beforeId`` to fetch the next page.
+    """
+    return json_response(plan_store.list_plans(x_user_id, topic, limit, before, beforeId))
+
+@app.get("/api/plans/{plan_id}", response_model=LearningPlan)
+async def get_plan(plan_id: str, x_user_id: Annotated[str, Header()] = ""):
+    """Get one of the caller's stored learning plans"""
+    plan = plan_store.get(plan_id, x_user_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return json_response(plan)
+
+@app.patch("/api/plans/{plan_id}/resources/{resource_id}", response_model=Resource)
+async def update_resource(plan_id: str, resource_id: str, update: ResourceUpdate, x_user_id: Annotated[str, Header()] = ""):
+    """Update one resource's completion or rating"""
+    resource = plan_store.update_resource(plan_id, resource_id, update.completed, update.rating, x_user_id)
+    if resource is None:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    return json_response(resource)
+
+@app.patch("/api/plans/{plan_id}/milestones/{milestone_id}", response_model=Milestone)
+async def update_milestone(plan_id: str, milestone_id: str, update: MilestoneUpdate, x_user_id: Annotated[str, Header()] = ""):
+    """Mark one milestone as completed or not"""
+    milestone = plan_store.update_milestone(plan_id, milestone_id, update.completed, x_user_id)
+    if milestone is None:
+        raise HTTPException(status_code=404, detail="Milestone not found")
+    return json_response(milestone)
+
+@app.post("/api/plans/{plan_id}/replan", response_model=LearningPlan)
+async def replan(
+    plan_id: str,
+    request: ReplanRequest,
+    x_user_id: Annotated[str, Header()] = "",
+    client: str = Depends(client_id),
+):
+    """Reschedule a stored plan's unfinished resources without regenerating it.
+
+    Optionally tops the plan up with ``extraResources`` new resources from a small Perplexity request.
+    """
+    plan = plan_store.get(plan_id, x_user_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    try:
+        parse_iso_date(plan.createdAt)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Plan createdAt must be an ISO date")
+    end_date = None
+    if request.endDate:
+        try:
+            end_date = parse_iso_date(request.endDate)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="endDate must be an ISO date")
+        if end_date.date() < datetime.now().date():
+            raise HTTPException(status_code=400, detail="endDate must not be in the past")
+    
+    extra_resources = []
+    if request.extraResources:
+        check_api_key()
+        try:
+            await admission.admit(client)
+            extra_resources = await fetch_extra_resources(plan, request.extraResources)
+        except UPSTREAM_ERRORS as e:
+            raise upstream_error(e)
     
-    except requests.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error calling Perplexity API: {str(e)}")
+    new_plan = replan_learning_plan(plan, end_date, request.studyTimePerDay, extra_resources)
+    plan_store.save(new_plan)
+    return json_response(new_plan)
+
+@app.delete("/api/plans/{plan_id}")
+async def delete_plan(plan_id: str, x_user_id: Annotated[str, Header()] = ""):
+    """Delete one of the caller's stored learning plans"""
+    if not plan_store.delete(plan_id, x_user_id):
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return {"deleted": plan_id}
 
 @app.get("/api/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "ok"}
+async def health_check(response: Response, ready: bool = False):
+    """Health check endpoint.
+
+    With ``ready=true`` it reports whether the worker can serve plans right now: the
+    upstream circuit breaker state and how saturated the upstream pool is. An open
+    circuit answers 503 so load balancers can route around the worker.
+    """
+    if not ready:
+        return {"status": "ok"}
+    
+    circuit = perplexity_client.breaker.state
+    saturation = perplexity_client.in_flight / perplexity_client.max_concurrency
+    if circuit == "open":
+        status = "unavailable"
+        response.status_code = 503
+    elif circuit == "half_open" or saturation >= 1:
+        status = "degraded"
+    else:
+        status = "ok"
+    return {
+        "status": status,
+        "circuit": circuit,
+        "upstream": {
+            "inFlight": perplexity_client.in_flight,
+            "maxConcurrency": perplexity_client.max_concurrency,
+            "saturation": saturation,
+        },
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    metrics.UPSTREAM_IN_FLIGHT.set(perplexity_client.in_flight)
+    metrics.UPSTREAM_SATURATION.set(perplexity_client.in_flight / perplexity_client.max_concurrency)
+    circuit = perplexity_client.breaker.state
+    for state in ("closed", "open", "half_open"):
+        metrics.CIRCUIT_STATE.set(int(state == circuit), state=state)
+    for stat, value in job_queue.stats().items():
+        if isinstance(value, int):
+            metrics.JOBS.set(value, stat=stat)
+    catalog_stats = resource_catalog.stats()
+    for stat in ("entries", "deduplicated", "filtered"):
+        metrics.CATALOG.set(catalog_stats[stat], stat=stat)
+    for status, count in catalog_stats["links"].items():
+        metrics.CATALOG.set(count, stat=f"links_{status}")
+    admission_stats = admission.stats()
+    metrics.ADMISSION.set(admission_stats["admitted"], stat="admitted")
+    metrics.ADMISSION.set(admission_stats["queued"], stat="queued")
+    metrics.ADMISSION.set(admission_stats["queueDepth"], stat="queue_depth")
+    for scope, count in admission_stats["rejected"].items():
+        metrics.ADMISSION.set(count, stat=f"rejected_{scope}")
+    for stat, value in plan_cache.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.PLAN_CACHE.set(value, stat=stat)
+    topic_stats = topic_index.stats()
+    metrics.PLAN_CACHE.set(topic_stats["topics"], stat="similar_topics")
+    metrics.PLAN_CACHE.set(topic_stats["hits"], stat="similar_hits")
+    warm_stats = warm_cache.stats()
+    metrics.PLAN_CACHE.set(warm_stats["entries"], stat="warm_entries")
+    metrics.PLAN_CACHE.set(warm_stats["hits"] + warm_stats["staleHits"], stat="warm_hits")
+    metrics.PLAN_CACHE.set(len(plan_refreshes), stat="refreshing")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Plan cache hit, miss and eviction counters, near-duplicate topic matches and the warm tier"""
+    return {
+        **plan_cache.stats(),
+        "refreshing": len(plan_refreshes),
+        "similarTopics": topic_index.stats(),
+        "warm": warm_cache.stats(),
+    }
+
+@app.get("/api/catalog/stats")
+async def catalog_stats():
+    """Resource catalog size, deduplication and filtering counters, and links by status"""
+    return resource_catalog.stats()
+
+@app.get("/api/upstream/stats")
+async def upstream_stats():
+    """Perplexity client retry, hedge and circuit breaker state, and admission counters"""
+    return {**perplexity_client.stats(), "admission": admission.stats()}
 
 if __name__ == "__main__":
     import uvicorn
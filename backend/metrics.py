@@ -0,0 +1,250 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+# Latency buckets in seconds (upstream calls can take most of a minute)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """Base class of labelled metrics rendered in the Prometheus text format"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count of observations per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics exposed together on /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers are sent, by route",
+    ("method", "route", "status", "outcome"),
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "plan_stage_duration_seconds",
+    "Time spent in each stage of plan generation",
+    ("stage", "outcome", "status"),
+))
+SONAR_TOKENS = REGISTRY.register(Histogram(
+    "sonar_usage_tokens",
+    "Tokens per Sonar completion as reported in its usage block",
+    ("kind",),
+    TOKEN_BUCKETS,
+))
+PLAN_PARSE = REGISTRY.register(Counter(
+    "plan_parse_total",
+    "Parsed Sonar responses by parse path (direct, fallback, stream, failed)",
+    ("path",),
+))
+
+# Stage timings of the current request, reported in its Server-Timing header
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace", default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request"""
+    spans: List[Tuple[str, float]] = []
+    _trace.set(spans)
+    return spans
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans)
+
+
+def error_status(error: BaseException) -> str:
+    """Status code label for an exception raised during a stage"""
+    if isinstance(error, HTTPException):
+        return str(error.status_code)
+    if isinstance(error, httpx.HTTPStatusError):
+        return str(error.response.status_code)
+    return ""
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as one stage of plan generation"""
+    start = time.perf_counter()
+    outcome, status = "ok", ""
+    try:
+        yield
+    except BaseException as e:
+        outcome, status = "error", error_status(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name, outcome=outcome, status=status)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def record_usage(usage: Optional[Dict[str, int]]) -> None:
+    """Record the token counts of a Sonar usage block"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if kind in usage:
+            SONAR_TOKENS.observe(usage[kind], kind=kind[: -len("_tokens")])
+
+# Snapshots refreshed when /metrics is scraped
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "sonar_in_flight_requests",
+    "Sonar calls currently in flight",
+))
+UPSTREAM_SATURATION = REGISTRY.register(Gauge(
+    "sonar_pool_saturation",
+    "Sonar calls in flight as a fraction of PERPLEXITY_MAX_CONCURRENCY",
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "sonar_circuit_state",
+    "1 for the current state of the Sonar circuit breaker",
+    ("state",),
+))
+PLAN_CACHE = REGISTRY.register(Gauge(
+    "plan_cache",
+    "Plan cache counters and occupancy",
+    ("stat",),
+))
+ADMISSION = REGISTRY.register(Gauge(
+    "sonar_admission",
+    "Upstream admission counters (admitted, queued, rejected by scope) and queue depth",
+    ("stat",),
+))
+JOBS = REGISTRY.register(Gauge(
+    "plan_jobs",
+    "Background plan job counters, running jobs and queue depth",
+    ("stat",),
+))
+
+CATALOG = REGISTRY.register(Gauge(
+    "resource_catalog",
+    "Resource catalog entries, deduplicated and filtered resources, and links by status",
+    ("stat",),
+))
@@ -0,0 +1,69 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Literal
+from enum import Enum
+
+# Models
+class LearningPreference(str, Enum):
+    VIDEO = "video"
+    TEXT = "text"
+    PROJECT = "project"
+    INTERACTIVE = "interactive"
+    AUDIO = "audio"
+
+class Resource(BaseModel):
+    id: str
+    title: str
+    url: str
+    type: str  # Using string instead of enum for compatibility with frontend
+    description: str
+    estimatedTime: int  # minutes
+    completed: bool = False
+    dueDate: Optional[str] = None
+    rating: Optional[int] = None  # 1-5 rating after completion
+    catalogId: Optional[str] = None  # shared resource catalog entry (by normalized URL)
+
+class Milestone(BaseModel):
+    id: str
+    title: str
+    description: str
+    targetDate: str
+    completed: bool = False
+    resources: List[str]  # resource IDs
+
+class TopicInputData(BaseModel):
+    topic: str
+    timeframe: int
+    timeframeUnit: Literal["days", "weeks", "months"]
+    knowledgeLevel: Literal["beginner", "intermediate", "advanced"]
+    preferences: List[str]  # Using string instead of enum for compatibility with frontend
+    studyTimePerDay: int
+
+class LearningPlan(BaseModel):
+    id: str
+    title: str
+    topic: str
+    timeframe: int
+    timeframeUnit: Literal["days", "weeks", "months"]
+    knowledgeLevel: Literal["beginner", "intermediate", "advanced"]
+    preferences: List[str]  # Using string instead of enum for compatibility with frontend
+    studyTimePerDay: int
+    resources: List[Resource]
+    milestones: List[Milestone]
+    createdAt: str
+    updatedAt: str
+
+
+class ResourceUpdate(BaseModel):
+    completed: Optional[bool] = None
+    rating: Optional[int] = Field(None, ge=1, le=5)  # 1-5 rating after completion
+
+class MilestoneUpdate(BaseModel):
+    completed: bool
+
+class ReplanRequest(BaseModel):
+    endDate: Optional[str] = None  # ISO date; defaults to the plan's current end date
+    studyTimePerDay: Optional[int] = None
+    extraResources: int = Field(0, ge=0, le=10)  # resources to top the plan up with
+
+class PlanJobRequest(TopicInputData):
+    callbackUrl: Optional[str] = None  # the finished job is POSTed here
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+# Upstream settings, overridable through the environment (e.g. to point at a local stub server)
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+PERPLEXITY_CONNECT_TIMEOUT = float(os.getenv("PERPLEXITY_CONNECT_TIMEOUT", "5"))
+PERPLEXITY_READ_TIMEOUT = float(os.getenv("PERPLEXITY_READ_TIMEOUT", "60"))
+PERPLEXITY_MAX_CONNECTIONS = int(os.getenv("PERPLEXITY_MAX_CONNECTIONS", "20"))
+PERPLEXITY_MAX_CONCURRENCY = int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "20"))
+
+
+class PerplexityClient:
+    """Async Perplexity client sharing one pooled, keep-alive HTTP connection pool"""
+
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = PERPLEXITY_API_URL,
+        connect_timeout: float = PERPLEXITY_CONNECT_TIMEOUT,
+        read_timeout: float = PERPLEXITY_READ_TIMEOUT,
+        max_connections: int = PERPLEXITY_MAX_CONNECTIONS,
+        max_concurrency: int = PERPLEXITY_MAX_CONCURRENCY,
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Lazily create the shared HTTP client so it binds to the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._client
+
+    def connect(self) -> None:
+        """Create the connection pool now instead of on first use"""
+        self.client
+
+    async def chat_completion(self, payload: Dict[str, Any]) -> httpx.Response:
+        """POST a chat completion request, capped at max_concurrency calls in flight"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                response = await self.client.post(self.api_url, json=payload)
+            finally:
+                self.in_flight -= 1
+        response.raise_for_status()
+        return response
+
+    async def stream_chat_completion(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as they arrive"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                async with self.client.stream("POST", self.api_url, json={**payload, "stream": True}) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            content = (json.loads(data)["choices"][0].get("delta") or {}).get("content")
+                        except (json.JSONDecodeError, KeyError, IndexError, TypeError, AttributeError):
+                            # Not a completion chunk; if nothing usable arrives the caller's parse fails
+                            continue
+                        if isinstance(content, str) and content:
+                            yield content
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
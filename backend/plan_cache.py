@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlite_db import open_db
+
+# Cache settings
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", str(24 * 60 * 60)))  # seconds
+PLAN_CACHE_MAX_BYTES = int(os.getenv("PLAN_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PLAN_CACHE_STALE_TTL = float(os.getenv("PLAN_CACHE_STALE_TTL", str(7 * 24 * 60 * 60)))  # seconds past expiry
+PLAN_CACHE_DB = os.getenv("PLAN_CACHE_DB", "")  # empty disables the on-disk tier
+# Hits on entries this close to expiry trigger a background refresh (0 disables refreshing)
+PLAN_CACHE_REFRESH_AHEAD = float(os.getenv("PLAN_CACHE_REFRESH_AHEAD", str(60 * 60)))  # seconds
+# Expired entries are still served for this long while the background refresh runs
+PLAN_CACHE_STALE_WHILE_REVALIDATE = float(os.getenv("PLAN_CACHE_STALE_WHILE_REVALIDATE", str(60 * 60)))  # seconds
+
+
+def normalize_topic(topic: str) -> str:
+    """Case-fold a topic and collapse its whitespace"""
+    return " ".join(topic.casefold().split())
+
+
+def cache_key(input_data: Any) -> str:
+    """Content-addressed key for a TopicInputData request"""
+    normalized = {
+        "topic": normalize_topic(input_data.topic),
+        "timeframe": input_data.timeframe,
+        "timeframeUnit": input_data.timeframeUnit,
+        "knowledgeLevel": input_data.knowledgeLevel,
+        "preferences": sorted(input_data.preferences),
+        "studyTimePerDay": input_data.studyTimePerDay,
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Two-tier cache of parsed plan data: in-process LRU with TTL and a byte budget,
+    plus an optional SQLite tier that survives restarts. Expired entries are kept for
+    stale_ttl so they can still be served while the upstream is down."""
+
+    def __init__(
+        self,
+        ttl: float = PLAN_CACHE_TTL,
+        max_bytes: int = PLAN_CACHE_MAX_BYTES,
+        db_path: str = PLAN_CACHE_DB,
+        stale_ttl: float = PLAN_CACHE_STALE_TTL,
+        refresh_ahead: float = PLAN_CACHE_REFRESH_AHEAD,
+        stale_while_revalidate: float = PLAN_CACHE_STALE_WHILE_REVALIDATE,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        # Serving expired entries is only worth it while they are being refreshed
+        self.stale_while_revalidate = min(stale_while_revalidate, stale_ttl) if refresh_ahead > 0 else 0.0
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """The on-disk tier, opened on first use so each worker process gets its own connection"""
+        if self._connection is None and self.db_path:
+            self._connection = open_db(
+                self.db_path,
+                "CREATE TABLE IF NOT EXISTS plan_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)",
+            )
+        return self._connection
+
+    def connect(self) -> None:
+        """Open the on-disk tier (if configured) now instead of on first use"""
+        self._db
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached plan data, or None.
+
+        With allow_stale, entries that expired less than stale_ttl ago are returned too
+        (used when the upstream is unavailable).
+        """
+        entry = self.get_entry(key, self.stale_ttl if allow_stale else 0.0)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str, stale_for: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Cached plan data and its expiry time, or None.
+
+        Entries that expired less than stale_for seconds ago (stale_while_revalidate by
+        default) are returned too; check needs_refresh on the expiry time.
+        """
+        if stale_for is None:
+            stale_for = self.stale_while_revalidate
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            from_disk = False
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM plan_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = tuple(row)
+                    from_disk = True
+
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    if from_disk:
+                        self._insert(key, value, expires_at)
+                        self.disk_hits += 1
+                    else:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                    return json.loads(value), expires_at
+                if expires_at + self.stale_ttl <= now:
+                    # Too old to serve even as stale data
+                    if not from_disk:
+                        self._remove(key)
+                    if self._db is not None:
+                        self._db.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+                    self.expirations += 1
+                elif expires_at + stale_for > now:
+                    self.stale_hits += 1
+                    return json.loads(value), expires_at
+
+            self.misses += 1
+            return None
+
+    def needs_refresh(self, expires_at: float) -> bool:
+        """Whether an entry expiring at expires_at should be refreshed in the background"""
+        return self.refresh_ahead > 0 and expires_at - time.time() < self.refresh_ahead
+
+    def set(self, key: str, plan_data: Dict[str, Any]) -> None:
+        """Store parsed plan data under key"""
+        value = json.dumps(plan_data, separators=(",", ":"))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plan_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM plan_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "staleHits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "diskEnabled": bool(self.db_path),
+            }
+
+    def _insert(self, key: str, value: str, expires_at: float) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,349 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from models import LearningPlan, Milestone, Resource
+from plan_cache import normalize_topic
+from sqlite_db import open_db
+
+# Path of the SQLite plan database (":memory:" keeps plans in process only)
+PLAN_STORE_DB = os.getenv("PLAN_STORE_DB", "plans.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    title TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    topic_key TEXT NOT NULL,
+    timeframe INTEGER NOT NULL,
+    timeframe_unit TEXT NOT NULL,
+    knowledge_level TEXT NOT NULL,
+    preferences TEXT NOT NULL,
+    study_time_per_day INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_owner_updated ON plans (owner, updated_at, id);
+CREATE INDEX IF NOT EXISTS plans_owner_topic_updated ON plans (owner, topic_key, updated_at, id);
+CREATE INDEX IF NOT EXISTS plans_updated ON plans (updated_at);
+
+CREATE TABLE IF NOT EXISTS plan_resources (
+    plan_id TEXT NOT NULL REFERENCES plans (id) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    type TEXT NOT NULL,
+    description TEXT NOT NULL,
+    estimated_time INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    due_date TEXT,
+    rating INTEGER,
+    catalog_id TEXT,
+    PRIMARY KEY (plan_id, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS plan_milestones (
+    plan_id TEXT NOT NULL REFERENCES plans (id) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    resource_ids TEXT NOT NULL,
+    PRIMARY KEY (plan_id, id)
+) WITHOUT ROWID;
+"""
+
+
+class PlanOwnershipError(Exception):
+    """Raised when saving a plan would replace a plan of another owner"""
+
+
+class PlanStore:
+    """SQLite (WAL mode) repository of learning plans.
+
+    Plans are stored row-per-resource and row-per-milestone so progress updates touch
+    a single row instead of rewriting the whole plan document.
+    """
+
+    def __init__(self, db_path: str = PLAN_STORE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Lazily open the database so each worker process gets its own connection"""
+        if self._connection is None:
+            connection = open_db(self.db_path, SCHEMA)
+            connection.execute("PRAGMA foreign_keys=ON")
+            # Databases created before resources referenced the catalog
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(plan_resources)")}
+            if "catalog_id" not in columns:
+                connection.execute("ALTER TABLE plan_resources ADD COLUMN catalog_id TEXT")
+            self._connection = connection
+        return self._connection
+
+    def connect(self) -> None:
+        """Open the database now instead of on first use"""
+        self._db
+
+    def save(self, plan: LearningPlan, owner: Optional[str] = None) -> None:
+        """Insert or replace a complete plan (owner None keeps the stored plan's owner).
+
+        Raises PlanOwnershipError if a plan with the same id belongs to another owner.
+        """
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            row = self._db.execute("SELECT owner FROM plans WHERE id = ?", (plan.id,)).fetchone()
+            if owner is None:
+                owner = row[0] if row else ""
+            elif row is not None and row[0] != owner:
+                raise PlanOwnershipError(plan.id)
+            self._db.execute("DELETE FROM plans WHERE id = ?", (plan.id,))
+            self._db.execute(
+                "INSERT INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    plan.id, owner, plan.title, plan.topic, normalize_topic(plan.topic),
+                    plan.timeframe, plan.timeframeUnit, plan.knowledgeLevel,
+                    json.dumps(plan.preferences), plan.studyTimePerDay,
+                    plan.createdAt, plan.updatedAt,
+                ),
+            )
+            self._db.executemany(
+                "INSERT INTO plan_resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        plan.id, r.id, position, r.title, r.url, r.type, r.description,
+                        r.estimatedTime, int(r.completed), r.dueDate, r.rating, r.catalogId,
+                    )
+                    for position, r in enumerate(plan.resources)
+                ],
+            )
+            self._db.executemany(
+                "INSERT INTO plan_milestones VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        plan.id, m.id, position, m.title, m.description, m.targetDate,
+                        int(m.completed), json.dumps(m.resources),
+                    )
+                    for position, m in enumerate(plan.milestones)
+                ],
+            )
+
+    def get(self, plan_id: str, owner: Optional[str] = None) -> Optional[LearningPlan]:
+        """Load one plan by id (None unless it belongs to owner, when given)"""
+        if owner is None:
+            plans = self._load("SELECT * FROM plans WHERE id = ?", (plan_id,))
+        else:
+            plans = self._load("SELECT * FROM plans WHERE id = ? AND owner = ?", (plan_id, owner))
+        return plans[0] if plans else None
+
+    def list_plans(
+        self,
+        owner: str = "",
+        topic: Optional[str] = None,
+        limit: int = 50,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None,
+    ) -> List[LearningPlan]:
+        """Most recently updated plans of an owner, optionally for one topic.
+
+        Uses keyset pagination: pass the ``updatedAt`` and ``id`` of the last plan of a
+        page as ``before`` and ``before_id`` to get the next page (plans updated at the
+        same instant are ordered by id). Each page is an index range scan.
+        """
+        clauses = ["owner = ?"]
+        params: list = [owner]
+        if topic:
+            clauses.append("topic_key = ?")
+            params.append(normalize_topic(topic))
+        if before and before_id:
+            clauses.append("(updated_at, id) < (?, ?)")
+            params.extend((before, before_id))
+        elif before:
+            clauses.append("updated_at < ?")
+            params.append(before)
+        params.append(limit)
+        return self._load(
+            f"SELECT * FROM plans WHERE {' AND '.join(clauses)} ORDER BY updated_at DESC, id DESC LIMIT ?",
+            params,
+        )
+
+    def popular_topics(self, limit: int, since: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Most planned topics (normalized) with their plan counts, optionally since an ISO date"""
+        where, params = ("WHERE created_at >= ?", [since]) if since else ("", [])
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT MIN(topic), COUNT(*) AS plans FROM plans {where} "
+                "GROUP BY topic_key ORDER BY plans DESC, topic_key LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def popular_preferences(self, limit: int, since: Optional[str] = None) -> List[Tuple[List[str], int]]:
+        """Most requested preference sets (sorted) with their plan counts"""
+        where, params = ("WHERE created_at >= ?", [since]) if since else ("", [])
+        with self._lock:
+            rows = self._db.execute(f"SELECT preferences, COUNT(*) FROM plans {where} GROUP BY preferences", params).fetchall()
+        counts: Counter = Counter()
+        for preferences, plans in rows:
+            counts[tuple(sorted(json.loads(preferences)))] += plans
+        return [(list(preferences), count) for preferences, count in counts.most_common(limit)]
+
+    def update_resource(
+        self,
+        plan_id: str,
+        resource_id: str,
+        completed: Optional[bool] = None,
+        rating: Optional[int] = None,
+        owner: Optional[str] = None,
+    ) -> Optional[Resource]:
+        """Update one resource's completion and/or rating; returns None if it doesn't exist
+        (or its plan does not belong to owner, when given)"""
+        assignments = []
+        params: list = []
+        if completed is not None:
+            assignments.append("completed = ?")
+            params.append(int(completed))
+        if rating is not None:
+            assignments.append("rating = ?")
+            params.append(rating)
+
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            if not self._owned(plan_id, owner):
+                return None
+            if assignments:
+                cursor = self._db.execute(
+                    f"UPDATE plan_resources SET {', '.join(assignments)} WHERE plan_id = ? AND id = ?",
+                    params + [plan_id, resource_id],
+                )
+                if cursor.rowcount:
+                    self._touch(plan_id)
+            row = self._db.execute(
+                "SELECT * FROM plan_resources WHERE plan_id = ? AND id = ?", (plan_id, resource_id)
+            ).fetchone()
+        return self._resource(row) if row else None
+
+    def update_milestone(
+        self, plan_id: str, milestone_id: str, completed: bool, owner: Optional[str] = None
+    ) -> Optional[Milestone]:
+        """Mark one milestone (in)complete; returns None if it doesn't exist (or is not owner's)"""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            if not self._owned(plan_id, owner):
+                return None
+            cursor = self._db.execute(
+                "UPDATE plan_milestones SET completed = ? WHERE plan_id = ? AND id = ?",
+                (int(completed), plan_id, milestone_id),
+            )
+            if cursor.rowcount:
+                self._touch(plan_id)
+            row = self._db.execute(
+                "SELECT * FROM plan_milestones WHERE plan_id = ? AND id = ?", (plan_id, milestone_id)
+            ).fetchone()
+        return self._milestone(row) if row else None
+
+    def delete(self, plan_id: str, owner: Optional[str] = None) -> bool:
+        """Delete a plan with its resources and milestones (only if it is owner's, when given)"""
+        with self._lock, self._db:
+            if owner is None:
+                cursor = self._db.execute("DELETE FROM plans WHERE id = ?", (plan_id,))
+            else:
+                cursor = self._db.execute("DELETE FROM plans WHERE id = ? AND owner = ?", (plan_id, owner))
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _owned(self, plan_id: str, owner: Optional[str]) -> bool:
+        if owner is None:
+            return True
+        row = self._db.execute("SELECT owner FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def _touch(self, plan_id: str) -> None:
+        self._db.execute(
+            "UPDATE plans SET updated_at = ? WHERE id = ?", (datetime.now().isoformat(), plan_id)
+        )
+
+    def _load(self, query: str, params) -> List[LearningPlan]:
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.row_factory = sqlite3.Row
+            plan_rows = cursor.execute(query, params).fetchall()
+            if not plan_rows:
+                return []
+            ids = [row["id"] for row in plan_rows]
+            marks = ", ".join("?" * len(ids))
+            resource_rows = cursor.execute(
+                f"SELECT * FROM plan_resources WHERE plan_id IN ({marks}) ORDER BY plan_id, position", ids
+            ).fetchall()
+            milestone_rows = cursor.execute(
+                f"SELECT * FROM plan_milestones WHERE plan_id IN ({marks}) ORDER BY plan_id, position", ids
+            ).fetchall()
+
+        resources: Dict[str, List[Resource]] = {plan_id: [] for plan_id in ids}
+        for row in resource_rows:
+            resources[row["plan_id"]].append(self._resource(row))
+        milestones: Dict[str, List[Milestone]] = {plan_id: [] for plan_id in ids}
+        for row in milestone_rows:
+            milestones[row["plan_id"]].append(self._milestone(row))
+
+        return [
+            LearningPlan(
+                id=row["id"],
+                title=row["title"],
+                topic=row["topic"],
+                timeframe=row["timeframe"],
+                timeframeUnit=row["timeframe_unit"],
+                knowledgeLevel=row["knowledge_level"],
+                preferences=json.loads(row["preferences"]),
+                studyTimePerDay=row["study_time_per_day"],
+                resources=resources[row["id"]],
+                milestones=milestones[row["id"]],
+                createdAt=row["created_at"],
+                updatedAt=row["updated_at"],
+            )
+            for row in plan_rows
+        ]
+
+    @staticmethod
+    def _resource(row) -> Resource:
+        # Column order of plan_resources
+        _, id, _, title, url, type, description, estimated_time, completed, due_date, rating, catalog_id = tuple(row)
+        return Resource(
+            id=id,
+            title=title,
+            url=url,
+            type=type,
+            description=description,
+            estimatedTime=estimated_time,
+            completed=bool(completed),
+            dueDate=due_date,
+            rating=rating,
+            catalogId=catalog_id,
+        )
+
+    @staticmethod
+    def _milestone(row) -> Milestone:
+        # Column order of plan_milestones
+        _, id, _, title, description, target_date, completed, resource_ids = tuple(row)
+        return Milestone(
+            id=id,
+            title=title,
+            description=description,
+            targetDate=target_date,
+            completed=bool(completed),
+            resources=json.loads(resource_ids),
+        )
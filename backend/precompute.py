@@ -0,0 +1,175 @@
+"""Precompute plans for popular topics and write them to a warm cache file.
+
+Generates plan data for every topic x knowledge level x preference set, paced by
+--rate and the upstream budget shared with the running workers, and stores it in
+the plan cache (including its on-disk tier when PLAN_CACHE_DB is set) and in a
+compact file that workers memory-map at startup (WARM_CACHE_FILE).
+
+Topics come from a file (one per line) or from the most planned topics in the plan
+store. Entries of an existing output file that are not yet due for a refresh are
+kept without calling the upstream, so the command can run on a schedule.
+
+Usage (from the backend directory):
+    python precompute.py --topics topics.txt --output warm_cache.bin
+    python precompute.py --top 300 --output warm_cache.bin
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from plan_cache import PLAN_CACHE_REFRESH_AHEAD, PLAN_CACHE_TTL, cache_key
+from topic_index import scope_key
+from warm_cache import WARM_CACHE_FILE, WarmCache, write_warm_file
+
+logger = logging.getLogger("precompute")
+
+KNOWLEDGE_LEVELS = ("beginner", "intermediate", "advanced")
+
+
+def read_topics(path: str) -> List[str]:
+    """Topics listed one per line, skipping blank lines and # comments"""
+    with open(path) as f:
+        lines = (line.strip() for line in f)
+        return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+
+def popular(limit: int, since: Optional[str]) -> Tuple[List[str], List[List[str]]]:
+    """Most planned topics and preference sets in the plan store"""
+    from plan_store import PlanStore
+
+    store = PlanStore()
+    try:
+        topics = [topic for topic, _ in store.popular_topics(limit, since)]
+        preferences = [preferences for preferences, _ in store.popular_preferences(3, since)]
+    finally:
+        store.close()
+    return topics, preferences
+
+
+def plan_inputs(topics: Sequence[str], levels: Sequence[str], preference_sets: Sequence[List[str]], args: argparse.Namespace):
+    from models import TopicInputData
+
+    return [
+        TopicInputData(
+            topic=topic,
+            timeframe=args.timeframe,
+            timeframeUnit=args.timeframe_unit,
+            knowledgeLevel=level,
+            preferences=preferences,
+            studyTimePerDay=args.study_time,
+        )
+        for topic in topics
+        for level in levels
+        for preferences in preference_sets
+    ]
+
+
+async def generate(inputs, args: argparse.Namespace) -> List[Tuple[Sequence[str], Dict, float]]:
+    import main
+    from fastapi import HTTPException
+    from rate_limit import TokenBucket
+
+    previous = WarmCache(args.output)
+    if not args.force and os.path.exists(args.output):
+        previous.connect()
+    limiter = TokenBucket(args.rate, args.rate)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    entries: List[Tuple[Sequence[str], Dict, float]] = []
+    counts = {"generated": 0, "kept": 0, "failed": 0}
+
+    async def run(input_data) -> None:
+        key = cache_key(input_data)
+        keys = (key, scope_key(input_data))
+        entry = previous.get(key)
+        if entry is not None and entry[1] - time.time() > PLAN_CACHE_REFRESH_AHEAD:
+            entries.append((keys, entry[0], entry[1]))
+            counts["kept"] += 1
+            return
+        async with semaphore:
+            try:
+                plan_data = await main.fetch_and_cache_plan_data(input_data, key, limiter)
+            except (*main.UPSTREAM_ERRORS, HTTPException) as e:
+                logger.warning(f"Could not generate {input_data.topic!r} ({input_data.knowledgeLevel}): {e}")
+                counts["failed"] += 1
+                return
+        entries.append((keys, {"resources": plan_data.get("resources", [])}, time.time() + args.ttl))
+        counts["generated"] += 1
+        done = sum(counts.values())
+        if done % 50 == 0:
+            logger.info(f"{done}/{len(inputs)} plans")
+
+    main.check_api_key()
+    main.perplexity_client.connect()
+    main.plan_cache.connect()
+    try:
+        await asyncio.gather(*(run(input_data) for input_data in inputs))
+    finally:
+        await main.perplexity_client.aclose()
+        main.plan_cache.close()
+        main.admission.close()
+        previous.close()
+    logger.info(f"{counts['generated']} generated, {counts['kept']} kept, {counts['failed']} failed")
+    return entries
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    from main import BATCH_MAX_CONCURRENCY, BATCH_RATE_PER_SECOND
+
+    parser = argparse.ArgumentParser(description="Precompute plans for popular topics into a warm cache file")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topics", help="file with one topic per line")
+    source.add_argument("--top", type=int, help="use the N most planned topics in the plan store")
+    parser.add_argument("--since", help="with --top, only count plans created since this ISO date")
+    parser.add_argument("--levels", default=",".join(KNOWLEDGE_LEVELS), help="comma-separated knowledge levels")
+    parser.add_argument(
+        "--preferences",
+        action="append",
+        help="comma-separated preference set, repeatable (default: the 3 most requested, or video,text)",
+    )
+    parser.add_argument("--timeframe", type=int, default=4)
+    parser.add_argument("--timeframe-unit", default="weeks", choices=["days", "weeks", "months"])
+    parser.add_argument("--study-time", type=int, default=2, help="hours per day")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_SECOND, help="upstream calls per second")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY, help="upstream calls at once")
+    parser.add_argument("--ttl", type=float, default=PLAN_CACHE_TTL, help="seconds until the entries expire")
+    parser.add_argument("--output", default=WARM_CACHE_FILE or "warm_cache.bin", help="warm cache file to write")
+    parser.add_argument("--force", action="store_true", help="regenerate entries that are still fresh")
+    args = parser.parse_args(argv)
+    unknown = set(args.levels.split(",")) - set(KNOWLEDGE_LEVELS)
+    if unknown:
+        parser.error(f"unknown knowledge levels: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args = parse_args(argv)
+    if args.topics:
+        topics, preference_sets = read_topics(args.topics), []
+    else:
+        topics, preference_sets = popular(args.top, args.since)
+    if args.preferences:
+        preference_sets = [[p.strip() for p in value.split(",") if p.strip()] for value in args.preferences]
+    preference_sets = preference_sets or [["video", "text"]]
+    if not topics:
+        print("No topics to precompute.")
+        return 1
+
+    inputs = plan_inputs(topics, args.levels.split(","), preference_sets, args)
+    print(f"Precomputing {len(inputs)} plans ({len(topics)} topics x {len(args.levels.split(','))} levels x {len(preference_sets)} preference sets)")
+    entries = asyncio.run(generate(inputs, args))
+    if not entries:
+        print("No plans were generated; leaving the warm cache file unchanged.")
+        return 1
+    records = write_warm_file(args.output, entries)
+    print(f"Wrote {len(entries)} plans ({records} keys, {os.path.getsize(args.output)} bytes) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
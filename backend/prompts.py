@@ -0,0 +1,115 @@
+import os
+from typing import Any, Dict, Sequence, Tuple
+
+# Prompt profile for plan generation:
+#   verbose - the original prompt, 5-10 resources, a fixed 2000-token cap
+#   compact - a short prompt for exactly PROMPT_RESOURCES resources, max_tokens sized to them
+#   minimal - compact, without descriptions (filled in with a default server-side)
+PROMPT_PROFILE = os.getenv("PROMPT_PROFILE", "verbose")
+PROMPT_RESOURCES = int(os.getenv("PROMPT_RESOURCES", "8"))
+PROFILES = ("verbose", "compact", "minimal")
+if PROMPT_PROFILE not in PROFILES:
+    raise ValueError(f"PROMPT_PROFILE must be one of {', '.join(PROFILES)}, not {PROMPT_PROFILE!r}")
+
+VERBOSE_MAX_TOKENS = 2000
+FULL_FIELDS = ("title", "url", "type", "description", "estimatedTime")
+MINIMAL_FIELDS = ("title", "url", "type", "estimatedTime")
+# Completion tokens of one resource as JSON, with headroom for long titles and URLs
+TOKENS_PER_RESOURCE = {FULL_FIELDS: 110, MINIMAL_FIELDS: 55}
+RESPONSE_OVERHEAD_TOKENS = 30  # the enclosing object and array
+
+_FIELD_TYPES = {"estimatedTime": "integer"}
+
+SYSTEM_PROMPT = "You are a helpful AI assistant that creates personalized learning plans."
+
+
+def resources_response_format(fields: Sequence[str] = FULL_FIELDS) -> Dict[str, Any]:
+    """Structured output schema for a "resources" array with the given fields"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "resources": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {field: {"type": _FIELD_TYPES.get(field, "string")} for field in fields},
+                            "required": list(fields),
+                        },
+                    }
+                },
+                "required": ["resources"],
+            }
+        },
+    }
+
+
+# Structured output schema shared by every resource-generating request
+RESOURCES_RESPONSE_FORMAT = resources_response_format(FULL_FIELDS)
+MINIMAL_RESPONSE_FORMAT = resources_response_format(MINIMAL_FIELDS)
+
+
+def max_tokens_for(count: int, fields: Sequence[str] = FULL_FIELDS) -> int:
+    """Completion token cap for a response with count resources"""
+    return RESPONSE_OVERHEAD_TOKENS + count * TOKENS_PER_RESOURCE[tuple(fields)]
+
+
+def build_prompt(input_data: Any) -> str:
+    """Prepare the prompt for Perplexity API"""
+    prompt = f"""
+    Create a detailed learning plan for the topic: {input_data.topic}.
+    
+    User's knowledge level: {input_data.knowledgeLevel}
+    Timeframe: {input_data.timeframe} {input_data.timeframeUnit}
+    Learning preferences: {', '.join(input_data.preferences)}
+    Study time per day: {input_data.studyTimePerDay} hours
+    
+    Please provide a structured learning plan with the following components:
+    1. A list of 5-10 learning resources including:
+       - Title
+       - URL (can be fictional but realistic)
+       - Type (matching user preferences: {', '.join(input_data.preferences)})
+       - Description (1-2 sentences)
+       - Estimated time to complete (in minutes)
+    
+    Format the response as a JSON object with the following structure:
+    {{
+      "resources": [
+        {{
+          "title": "Resource title",
+          "url": "https://example.com/resource",
+          "type": "one of: video, text, project, interactive, audio",
+          "description": "Brief description of the resource",
+          "estimatedTime": time_in_minutes
+        }}
+      ]
+    }}
+    """
+    return prompt
+
+
+def build_compact_prompt(input_data: Any, count: int = PROMPT_RESOURCES, fields: Sequence[str] = FULL_FIELDS) -> str:
+    """Short prompt for exactly count resources; the JSON shape is left to response_format"""
+    types = "/".join(input_data.preferences) or "text"
+    description = " and a one-sentence description" if "description" in fields else ""
+    return (
+        f"List exactly {count} learning resources for {input_data.topic} "
+        f"({input_data.knowledgeLevel} level, {input_data.timeframe} {input_data.timeframeUnit} "
+        f"at {input_data.studyTimePerDay} h/day), best first. Each with title, url, type ({types}){description} "
+        f"and estimatedTime in minutes."
+    )
+
+
+def prompt_request(input_data: Any, profile: str = PROMPT_PROFILE) -> Tuple[str, int, Dict[str, Any]]:
+    """User prompt, max_tokens and response_format of a plan request under a profile"""
+    if profile == "compact":
+        return build_compact_prompt(input_data), max_tokens_for(PROMPT_RESOURCES), RESOURCES_RESPONSE_FORMAT
+    if profile == "minimal":
+        return (
+            build_compact_prompt(input_data, fields=MINIMAL_FIELDS),
+            max_tokens_for(PROMPT_RESOURCES, MINIMAL_FIELDS),
+            MINIMAL_RESPONSE_FORMAT,
+        )
+    return build_prompt(input_data), VERBOSE_MAX_TOKENS, RESOURCES_RESPONSE_FORMAT
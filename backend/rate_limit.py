@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlite_db import open_db
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; otherwise return the seconds until they will be"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until tokens are available, without taking them"""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until tokens are available and take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class MemoryBuckets:
+    """Named token buckets in process memory, least recently used evicted beyond max_buckets"""
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def try_acquire(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Take tokens from the named bucket; return the seconds to wait if it is short"""
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = TokenBucket(rate, capacity)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(name)
+        return bucket.try_acquire(tokens)
+
+    def wait_time(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Seconds until the named bucket has tokens, without taking them"""
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            return max(0.0, (tokens - capacity) / rate)
+        return bucket.wait_time(tokens)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteBuckets:
+    """Named token buckets in a SQLite file shared by every worker process.
+
+    Each acquire is one short write transaction, so all workers draw from the same
+    budget. Buckets idle long enough to have refilled completely are pruned.
+    """
+
+    PRUNE_EVERY = 1000  # acquires between prunes
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._acquires = 0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Budget counters do not need to survive a power loss
+            self._connection = open_db(
+                self.db_path,
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)",
+                synchronous="OFF",
+            )
+        return self._connection
+
+    def try_acquire(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Take tokens from the named bucket; return the seconds to wait if it is short"""
+        with self._lock:
+            db = self._db
+            # Wall clock, since monotonic clocks are not comparable across processes
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                available = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / rate
+                db.execute(
+                    "INSERT OR REPLACE INTO token_buckets VALUES (?, ?, ?, ?)",
+                    (name, available, now, now + (capacity - available) / rate),
+                )
+                self._acquires += 1
+                if self._acquires % self.PRUNE_EVERY == 0:
+                    db.execute("DELETE FROM token_buckets WHERE full_at < ?", (now,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return wait
+
+    def wait_time(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Seconds until the named bucket has tokens, without taking them"""
+        with self._lock:
+            row = self._db.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (name,)).fetchone()
+        available = capacity if row is None else min(capacity, row[0] + max(0.0, time.time() - row[1]) * rate)
+        return max(0.0, (tokens - available) / rate)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from perplexity_client import PerplexityClient
+
+# Retry settings
+PERPLEXITY_MAX_RETRIES = int(os.getenv("PERPLEXITY_MAX_RETRIES", "3"))
+PERPLEXITY_BACKOFF_BASE = float(os.getenv("PERPLEXITY_BACKOFF_BASE", "0.5"))  # seconds
+PERPLEXITY_BACKOFF_MAX = float(os.getenv("PERPLEXITY_BACKOFF_MAX", "8"))
+PERPLEXITY_RETRY_AFTER_MAX = float(os.getenv("PERPLEXITY_RETRY_AFTER_MAX", "30"))
+
+# Hedged requests (off by default: a hedge can double upstream token spend)
+PERPLEXITY_HEDGE = os.getenv("PERPLEXITY_HEDGE", "0") == "1"
+PERPLEXITY_HEDGE_QUANTILE = float(os.getenv("PERPLEXITY_HEDGE_QUANTILE", "0.95"))
+PERPLEXITY_HEDGE_MIN_SAMPLES = int(os.getenv("PERPLEXITY_HEDGE_MIN_SAMPLES", "20"))
+
+# Circuit breaker settings
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "50"))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))  # seconds
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is failing"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens when the failure rate over the last `window` calls exceeds `failure_rate`.
+
+    While open every call fails fast. After `cooldown` seconds one probe call is let
+    through (half-open); its outcome closes or re-opens the circuit. Outcomes of calls
+    that were already in flight when the circuit opened are ignored.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window: int = CIRCUIT_WINDOW,
+        cooldown: float = CIRCUIT_COOLDOWN,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go upstream now.
+
+        Returns True when the call is the half-open probe; pass that on to ``record``
+        or ``abandon`` so only the probe decides whether the circuit closes.
+        """
+        if self._opened_at is None:
+            return False
+        remaining = self.cooldown - (time.monotonic() - self._opened_at)
+        if remaining > 0 or self._probing:
+            raise CircuitOpenError(max(remaining, 1))
+        self._probing = True
+        return True
+
+    def record(self, success: bool, probe: bool = False) -> None:
+        if probe:
+            self._probing = False
+            if success:
+                self._opened_at = None
+                self._outcomes.clear()
+            else:
+                self._opened_at = time.monotonic()
+            return
+        if self._opened_at is not None:
+            # A call started before the circuit opened
+            return
+
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._opened_at = time.monotonic()
+
+    def abandon(self, probe: bool = False) -> None:
+        """Forget a call that ended without an outcome (e.g. cancelled), freeing the probe slot if it was the probe"""
+        if probe:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "recentCalls": len(self._outcomes),
+            "recentFailures": self._outcomes.count(False),
+        }
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class ResilientPerplexityClient(PerplexityClient):
+    """PerplexityClient with retries, optional hedging and a circuit breaker.
+
+    429/5xx responses and transport errors are retried with full-jitter exponential
+    backoff, honoring Retry-After. With hedging enabled, a second identical request is
+    sent once the first has been outstanding longer than the recent p95 latency, and
+    the first response wins.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_retries: int = PERPLEXITY_MAX_RETRIES,
+        backoff_base: float = PERPLEXITY_BACKOFF_BASE,
+        backoff_max: float = PERPLEXITY_BACKOFF_MAX,
+        hedge: bool = PERPLEXITY_HEDGE,
+        breaker: Optional[CircuitBreaker] = None,
+        **kwargs,
+    ):
+        super().__init__(api_key, **kwargs)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self.retries = 0
+        self.hedges = 0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a retryable failure: the response's Retry-After
+        if it has one, else jittered backoff; None when Retry-After asks for longer than
+        PERPLEXITY_RETRY_AFTER_MAX, so the caller gives up"""
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = retry_after_seconds(error.response)
+            if retry_after is not None:
+                return retry_after if retry_after <= PERPLEXITY_RETRY_AFTER_MAX else None
+        return self.backoff(attempt)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Recent latency quantile, once enough samples exist"""
+        if len(self._latencies) < PERPLEXITY_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * PERPLEXITY_HEDGE_QUANTILE))]
+
+    async def _timed_attempt(self, payload: Dict[str, Any]) -> httpx.Response:
+        start = time.monotonic()
+        response = await PerplexityClient.chat_completion(self, payload)
+        self._latencies.append(time.monotonic() - start)
+        return response
+
+    async def _attempt(self, payload: Dict[str, Any]) -> httpx.Response:
+        delay = self.hedge_delay() if self.hedge else None
+        if delay is None:
+            return await self._timed_attempt(payload)
+
+        tasks = {asyncio.ensure_future(self._timed_attempt(payload))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(self._timed_attempt(payload)))
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def chat_completion(self, payload: Dict[str, Any]) -> httpx.Response:
+        """POST a chat completion with retries, hedging and circuit breaking"""
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                response = await self._attempt(payload)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                retryable = is_retryable(e)
+                # Other 4xx errors say nothing about upstream health
+                self.breaker.record(not retryable, probe)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.abandon(probe)
+                raise
+            self.breaker.record(True, probe)
+            return response
+
+    async def stream_chat_completion(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream a chat completion; failures before the first delta are retried"""
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            started = False
+            try:
+                async for content in PerplexityClient.stream_chat_completion(self, payload):
+                    started = True
+                    yield content
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                retryable = is_retryable(e)
+                self.breaker.record(not retryable, probe)
+                if started or not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.abandon(probe)
+                raise
+            self.breaker.record(True, probe)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedgeDelay": self.hedge_delay(),
+        }
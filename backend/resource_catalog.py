@@ -0,0 +1,227 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from plan_store import PLAN_STORE_DB
+from sqlite_db import open_db
+
+# Path of the SQLite catalog of distinct resources and their link health (default: the plan database)
+CATALOG_DB = os.getenv("CATALOG_DB", "") or PLAN_STORE_DB
+# Catalog entries kept in memory per worker (the table holds every entry)
+CATALOG_MAX_ENTRIES = int(os.getenv("CATALOG_MAX_ENTRIES", "100000"))
+# Seconds between reloads of the link statuses written by the link checker
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "60"))
+
+# Link statuses: unchecked until the link checker has seen the URL; unknown when the
+# check was inconclusive (timeouts, refused connections, 403s, 5xx, private addresses);
+# dead and fictional links are filtered
+LINK_STATUSES = ("unchecked", "ok", "unknown", "dead", "fictional")
+BAD_LINK_STATUSES = frozenset(("dead", "fictional"))
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = frozenset(("fbclid", "gclid", "ref", "ref_src", "si", "feature"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resource_catalog (
+    catalog_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    type TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    link_status TEXT NOT NULL DEFAULT 'unchecked',
+    http_status INTEGER,
+    checked_at REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resource_catalog_checked ON resource_catalog (checked_at);
+"""
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a resource URL, so copies of the same page deduplicate.
+
+    Case-folds the host, drops "www.", the default port, the fragment, a trailing slash
+    and tracking parameters, sorts the query and treats http as https.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    query = [
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in TRACKING_PARAMS and not name.startswith("utm_")
+    ]
+    if host == "youtu.be" and path:
+        host, query, path = "youtube.com", [("v", path[1:])], "/watch"
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    return f"https://{netloc}{path}" + (f"?{urlencode(sorted(query))}" if query else "")
+
+
+def catalog_id(url: str) -> str:
+    """Stable id of the catalog entry for a URL, the same in every worker"""
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()[:16]
+
+
+class CatalogEntry:
+    """One distinct resource; titles and types are interned, so repeated copies share them"""
+
+    __slots__ = ("id", "url", "title", "type")
+
+    def __init__(self, id: str, url: str, title: str, type: str):
+        self.id = id
+        self.url = url
+        self.title = sys.intern(title)
+        self.type = sys.intern(type)
+
+
+class ResourceCatalog:
+    """Deduplicated catalog of the resources Sonar returns, keyed by normalized URL.
+
+    Every resource of a generated plan is registered here (once per worker, then once in
+    the SQLite table) and plans refer to their entries by ``catalogId``. The link checker
+    (check_links.py) records each entry's link health in the table; workers reload the
+    bad links every CATALOG_RELOAD_INTERVAL seconds and drop them at plan build time, so
+    requests never wait on a network check.
+    """
+
+    def __init__(
+        self,
+        db_path: str = CATALOG_DB,
+        max_entries: int = CATALOG_MAX_ENTRIES,
+        reload_interval: float = CATALOG_RELOAD_INTERVAL,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._bad: Set[str] = set()
+        self._link_counts: Dict[str, int] = {}  # entries by link status, as of the last reload
+        self._loaded_at = 0.0  # wall clock of the last status reload
+        self._checked_since = 0.0  # checked_at already reflected in _bad
+        self.registered = 0
+        self.deduplicated = 0
+        self.filtered = 0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Lazily open the database so each worker process gets its own connection"""
+        if self._connection is None:
+            self._connection = open_db(self.db_path, SCHEMA)
+        return self._connection
+
+    def connect(self) -> None:
+        """Open the database and load the bad links now instead of on first use"""
+        with self._lock:
+            self._reload()
+
+    def register(self, resource_data: Dict[str, Any]) -> Optional[CatalogEntry]:
+        """The catalog entry of a parsed resource, adding it if its URL is new"""
+        url = resource_data.get("url")
+        if not url:
+            return None
+        entry_id = catalog_id(url)
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is not None:
+                self.deduplicated += 1
+                return entry
+            entry = CatalogEntry(entry_id, url, str(resource_data.get("title", "")), str(resource_data.get("type", "")))
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO resource_catalog (catalog_id, url, title, type, first_seen) VALUES (?, ?, ?, ?, ?)",
+                (entry_id, url, entry.title, entry.type, time.time()),
+            )
+            if cursor.rowcount:
+                self._link_counts["unchecked"] = self._link_counts.get("unchecked", 0) + 1
+            self.registered += 1
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[entry_id] = entry
+            return entry
+
+    def live(self, resources: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Parsed resources without the ones whose links are known to be bad"""
+        self._refresh()
+        if not self._bad:
+            return list(resources)
+        kept = []
+        for resource_data in resources:
+            if catalog_id(resource_data.get("url", "")) in self._bad:
+                self.filtered += 1
+                continue
+            kept.append(resource_data)
+        return kept
+
+    def due_for_check(self, max_age: float, limit: int) -> List[Tuple[str, str]]:
+        """(catalog id, url) of entries never checked or last checked max_age seconds ago"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT catalog_id, url FROM resource_catalog WHERE checked_at IS NULL OR checked_at < ? "
+                "ORDER BY checked_at IS NOT NULL, checked_at LIMIT ?",
+                (time.time() - max_age, limit),
+            ).fetchall()
+
+    def record_checks(self, results: Iterable[Tuple[str, str, Optional[int]]]) -> None:
+        """Store (catalog id, link status, HTTP status) results of the link checker"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE resource_catalog SET link_status = ?, http_status = ?, checked_at = ? WHERE catalog_id = ?",
+                [(status, http_status, now, entry_id) for entry_id, status, http_status in results],
+            )
+
+    def _refresh(self) -> None:
+        if time.time() - self._loaded_at >= self.reload_interval:
+            with self._lock:
+                self._reload()
+
+    def _reload(self) -> None:
+        """Apply link statuses recorded since the last reload and recount links by status"""
+        rows = self._db.execute(
+            "SELECT catalog_id, link_status, checked_at FROM resource_catalog WHERE checked_at >= ?",
+            (self._checked_since,),
+        ).fetchall()
+        for entry_id, status, checked_at in rows:
+            if status in BAD_LINK_STATUSES:
+                self._bad.add(entry_id)
+            else:
+                self._bad.discard(entry_id)
+            self._checked_since = max(self._checked_since, checked_at)
+        # Counted here, once per reload interval, rather than on every stats() call
+        self._link_counts = dict(self._db.execute(
+            "SELECT link_status, COUNT(*) FROM resource_catalog GROUP BY link_status"
+        ).fetchall())
+        self._loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and link counts (the counts as of the last reload, plus this worker's new entries)"""
+        self._refresh()
+        with self._lock:
+            statuses = dict(self._link_counts)
+            return {
+                "entries": sum(statuses.values()),
+                "cachedEntries": len(self._entries),
+                "registered": self.registered,
+                "deduplicated": self.deduplicated,
+                "filtered": self.filtered,
+                "links": {status: statuses.get(status, 0) for status in LINK_STATUSES},
+            }
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
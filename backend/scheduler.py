@@ -0,0 +1,101 @@
+import math
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DAYS_PER_MILESTONE = 7  # One milestone per week approximately
+
+
+def due_day_offsets(estimated_times: Sequence[int], total_days: int, study_time_per_day: Optional[float] = None) -> array:
+    """Day offsets (from the start date) by which each resource should be finished.
+
+    The timeframe is filled in proportion to each resource's estimated time, but a
+    resource is never due sooner than ``study_time_per_day`` hours a day allow, and
+    never after the last day.
+    """
+    offsets = array("l")
+    if not estimated_times:
+        return offsets
+
+    cumulative = list(accumulate(max(0, minutes or 0) for minutes in estimated_times))
+    total_minutes = cumulative[-1]
+    daily_minutes = study_time_per_day * 60 if study_time_per_day else 0
+    total_days = max(0, total_days)
+
+    for minutes in cumulative:
+        if total_minutes:
+            day = round(total_days * minutes / total_minutes)
+        else:
+            day = total_days
+        if daily_minutes:
+            day = max(day, math.ceil(minutes / daily_minutes))
+        offsets.append(min(day, total_days))
+    return offsets
+
+
+def days_needed(estimated_times: Sequence[int], study_time_per_day: Optional[float]) -> Optional[int]:
+    """Whole days ``study_time_per_day`` hours a day take to cover the estimated minutes
+    (at least one; None without a daily study time)"""
+    if not study_time_per_day or study_time_per_day <= 0:
+        return None
+    total_minutes = sum(max(0, minutes or 0) for minutes in estimated_times)
+    return max(1, math.ceil(total_minutes / (study_time_per_day * 60)))
+
+
+def milestone_day_offsets(total_days: int) -> array:
+    """Day offsets of the plan's milestones"""
+    milestone_count = max(1, total_days // DAYS_PER_MILESTONE)
+    days_per_milestone = total_days // milestone_count
+    return array("l", ((i + 1) * days_per_milestone for i in range(milestone_count)))
+
+
+def milestone_resource_indexes(resource_offsets: Sequence[Optional[int]], milestone_offsets: Sequence[int], per_milestone: int = 3) -> List[List[int]]:
+    """For each milestone, the indexes of the (up to ``per_milestone``) latest resources due by it.
+
+    Resources without a due day are ignored. One sort plus a binary search per milestone
+    replaces comparing every resource against every milestone.
+    """
+    ordered: List[Tuple[int, int]] = sorted(
+        (offset, index) for index, offset in enumerate(resource_offsets) if offset is not None
+    )
+    days = [offset for offset, _ in ordered]
+    assigned = []
+    for milestone_offset in milestone_offsets:
+        count = bisect_right(days, milestone_offset)
+        assigned.append([index for _, index in ordered[max(0, count - per_milestone):count]])
+    return assigned
+
+
+def parse_iso_date(iso_date: str) -> datetime:
+    """Parse an ISO date as a naive local datetime, converting dates with an offset (or
+    a "Z", as JavaScript's toISOString writes them); raises ValueError if unparseable"""
+    if iso_date.endswith(("Z", "z")):
+        iso_date = iso_date[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(iso_date)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def day_offset(start_date: datetime, iso_date: Optional[str]) -> Optional[int]:
+    """Days from start_date to an ISO date string, rounded up (None stays None)"""
+    if not iso_date:
+        return None
+    return math.ceil((parse_iso_date(iso_date) - start_date).total_seconds() / 86400)
+
+
+class IsoDates:
+    """Materializes ``start_date + n days`` ISO strings, once per distinct day"""
+
+    def __init__(self, start_date: datetime):
+        self.start_date = start_date
+        self._cache: Dict[int, str] = {}
+
+    def __getitem__(self, offset: int) -> str:
+        iso = self._cache.get(offset)
+        if iso is None:
+            iso = (self.start_date + timedelta(days=offset)).isoformat()
+            self._cache[offset] = iso
+        return iso
@@ -0,0 +1,21 @@
+import os
+import sqlite3
+
+# Seconds a connection waits for another worker's write lock before raising "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+
+
+def open_db(path: str, schema: str = "", synchronous: str = "NORMAL") -> sqlite3.Connection:
+    """Open a SQLite database shared by worker processes and create its tables.
+
+    The connection is in autocommit mode (transactions are begun explicitly) and may be
+    used from any thread behind the owner's lock. WAL lets readers in other workers
+    proceed while one of them writes; with WAL, synchronous=NORMAL only risks the last
+    commits on a power loss, and OFF is for data that can be rebuilt.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(f"PRAGMA synchronous={synchronous}")
+    if schema:
+        connection.executescript(schema)
+    return connection
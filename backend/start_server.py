@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import socket
@@ -6,9 +7,20 @@ import subprocess
 from pathlib import Path
 from typing import Tuple, Optional
 
+# Production server settings (command line options override them)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 uses one worker per CPU
+SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", "5"))  # seconds
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))  # seconds to drain on SIGTERM
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")  # auto picks uvloop when installed
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")  # auto picks httptools when installed
+SERVER_LOG_LEVEL = os.getenv("SERVER_LOG_LEVEL", "info")
+
 def check_requirements():
     """Check if all required packages are installed"""
-    required_packages = ["fastapi", "uvicorn", "pydantic", "requests", "python-dotenv"]
+    required_packages = ["fastapi", "uvicorn", "pydantic", "httpx", "python-dotenv"]
     missing_packages = []
     
     for package in required_packages:
@@ -109,8 +121,76 @@ def find_available_port(start_port: int = 8000, max_attempts: int = 10) -> int:
         port += 1
     return start_port  # Return the original port if no available ports found
 
+def default_workers() -> int:
+    """One worker per available CPU"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Start the LearnFlow Pathfinder backend")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.getenv("SERVER_MODE") == "production",
+        help="run non-interactively with multiple workers and no reloader (or set SERVER_MODE=production)",
+    )
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="worker processes (default: CPU count)")
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEP_ALIVE, help="keep-alive timeout in seconds")
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG, help="listen backlog")
+    parser.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT, help="seconds to drain in-flight requests on SIGTERM")
+    parser.add_argument("--loop", default=SERVER_LOOP, choices=["auto", "asyncio", "uvloop"])
+    parser.add_argument("--http", default=SERVER_HTTP, choices=["auto", "h11", "httptools"])
+    parser.add_argument("--log-level", default=SERVER_LOG_LEVEL)
+    return parser.parse_args(argv)
+
+def run_production(args: argparse.Namespace) -> int:
+    """Start worker processes without prompts; fail fast on a bad environment"""
+    if not check_requirements():
+        return 1
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not is_valid_api_key(os.getenv("PERPLEXITY_API_KEY", "")):
+        print("PERPLEXITY_API_KEY is not set or appears invalid.")
+        return 1
+    
+    if not check_port_available(args.port):
+        print(f"Port {args.port} is already in use.")
+        return 1
+    
+    import uvicorn
+    # Applies to the application loggers of every worker as well
+    os.environ["LOG_LEVEL"] = args.log_level.upper()
+    workers = args.workers or default_workers()
+    print(f"Starting FastAPI server on {args.host}:{args.port} with {workers} worker(s)...")
+    # uvicorn stops accepting connections on SIGTERM, lets in-flight requests finish
+    # (up to the graceful timeout) and then runs each worker's lifespan shutdown
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        access_log=False,
+        log_level=args.log_level,
+    )
+    return 0
+
 def main():
     """Main function to start the server"""
+    args = parse_args()
+    if args.production:
+        sys.exit(run_production(args))
+    
     print("Starting LearnFlow Pathfinder Backend...")
     
     # Check requirements
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from plan_cache import normalize_topic
+
+# Minimum trigram Jaccard similarity for reusing another topic's plan (0 disables it)
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.8"))
+TOPIC_INDEX_MAX_TOPICS = int(os.getenv("TOPIC_INDEX_MAX_TOPICS", "200000"))
+
+# Words that frame a topic rather than name it, stripped from its ends before comparing
+LEADING_WORDS = frozenset(
+    "learn learning study studying master mastering understand understanding intro introduction "
+    "to the a an getting started with get into basics of fundamentals principles".split()
+)
+TRAILING_WORDS = frozenset(
+    "programming language lang basics fundamentals essentials course tutorial crash 101 "
+    "for beginner beginners newbies from scratch in depth".split()
+)
+
+# Plans are only shared between requests with timeframes in the same bucket (days)
+TIMEFRAME_BUCKETS = (7, 31, 92, 183, 366)
+TIMEFRAME_UNIT_DAYS = {"days": 1, "weeks": 7, "months": 30}
+
+# Roman numerals that number courses and parts ("Calculus II")
+ROMAN_NUMERALS = frozenset("i ii iii iv v vi vii viii ix x xi xii".split())
+
+_WORD = re.compile(r"[\w+#]+")
+_DIGIT = re.compile(r"\d")
+_PRIME = (1 << 61) - 1
+
+Scope = Tuple[str, int, Tuple[str, ...], Tuple[str, ...]]
+
+
+def core_topic(topic: str) -> str:
+    """The words naming a topic, without framing like "learn" or "for beginners" """
+    words = _WORD.findall(normalize_topic(topic))
+    start, end = 0, len(words)
+    while start < end and words[start] in LEADING_WORDS:
+        start += 1
+    while end > start and words[end - 1] in TRAILING_WORDS:
+        end -= 1
+    # A topic made only of framing words is compared as written
+    return " ".join(words[start:end] or words)
+
+
+def numbering(core: str) -> Tuple[str, ...]:
+    """Words that number or version a topic ("2", "ii", "es6", "python3"), which must match
+    exactly: "Calculus 1" and "Calculus 2" are different courses however similar they look"""
+    return tuple(sorted(word for word in core.split() if word in ROMAN_NUMERALS or _DIGIT.search(word)))
+
+
+def shingles(core: str) -> FrozenSet[str]:
+    """Character trigrams of each word (padded), so word order does not matter"""
+    grams = set()
+    for word in core.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def topic_scope(input_data: Any) -> Scope:
+    """Requests whose plans are interchangeable apart from the topic wording"""
+    days = input_data.timeframe * TIMEFRAME_UNIT_DAYS.get(input_data.timeframeUnit, 30)
+    return (
+        input_data.knowledgeLevel,
+        bisect_left(TIMEFRAME_BUCKETS, days),
+        tuple(sorted(input_data.preferences)),
+        numbering(core_topic(input_data.topic)),
+    )
+
+
+def scope_key(input_data: Any) -> str:
+    """Key shared by requests for the same core topic within one scope"""
+    encoded = json.dumps([core_topic(input_data.topic), *topic_scope(input_data)], separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class TopicIndex:
+    """MinHash LSH index of topics whose plans are cached, for reusing the plan of a
+    near-duplicate topic ("Learn Rust", "rust programming", "Rust language basics").
+
+    Topics are reduced to their core words and compared as sets of character trigrams.
+    Each topic's MinHash signature is split into bands; topics sharing any band with the
+    query (within the same scope) are candidates, and the candidate with the highest
+    exact Jaccard similarity is returned if it reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        threshold: float = TOPIC_MATCH_THRESHOLD,
+        max_topics: int = TOPIC_INDEX_MAX_TOPICS,
+        bands: int = 12,
+        rows: int = 4,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.max_topics = max_topics
+        self.bands = bands
+        self.rows = rows
+        generator = random.Random(seed)
+        # Universal hash functions standing in for random permutations
+        self._permutations = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME)) for _ in range(bands * rows)
+        ]
+        self._lock = threading.Lock()
+        # key -> (scope, core, shingles, band keys), oldest first
+        self._entries: "OrderedDict[str, Tuple[Scope, str, FrozenSet[str], List[Tuple]]]" = OrderedDict()
+        self._by_topic: Dict[Tuple[Scope, str], str] = {}
+        self._buckets: Dict[Tuple, Set[str]] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _band_keys(self, scope: Scope, grams: FrozenSet[str]) -> List[Tuple]:
+        hashes = [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams]
+        permuted = [[(a * h + b) % _PRIME for a, b in self._permutations] for h in hashes]
+        signature = list(map(min, zip(*permuted)))
+        rows = self.rows
+        return [(scope, band, hash(tuple(signature[band * rows:(band + 1) * rows]))) for band in range(self.bands)]
+
+    def add(self, input_data: Any, key: str) -> None:
+        """Index the topic of a request whose plan data is cached under key"""
+        if not self.enabled:
+            return
+        scope = topic_scope(input_data)
+        core = core_topic(input_data.topic)
+        grams = shingles(core)
+        if not grams:
+            return
+        band_keys = self._band_keys(scope, grams)
+        with self._lock:
+            # Keep one entry per core topic and scope: the latest plan
+            previous = self._by_topic.get((scope, core))
+            if previous is not None:
+                self._remove(previous)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (scope, core, grams, band_keys)
+            self._by_topic[(scope, core)] = key
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_topics:
+                self._remove(next(iter(self._entries)))
+
+    def lookup(self, input_data: Any) -> Optional[Tuple[str, float]]:
+        """Cache key and similarity of the most similar indexed topic in the same scope,
+        or None if none reaches the threshold"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        scope = topic_scope(input_data)
+        core = core_topic(input_data.topic)
+        grams = shingles(core)
+        best: Optional[Tuple[str, float]] = None
+        with self._lock:
+            self.lookups += 1
+            exact = self._by_topic.get((scope, core))
+            if exact is not None:
+                best = (exact, 1.0)
+            elif grams:
+                candidates: Set[str] = set()
+                for band_key in self._band_keys(scope, grams):
+                    candidates.update(self._buckets.get(band_key, ()))
+                for candidate in candidates:
+                    score = jaccard(grams, self._entries[candidate][2])
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (candidate, score)
+            if best is not None:
+                self.hits += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return best
+
+    def discard(self, key: str) -> None:
+        """Forget the topic indexed under key (e.g. once its cache entry is gone)"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        scope, core, _, band_keys = self._entries.pop(key)
+        if self._by_topic.get((scope, core)) == key:
+            del self._by_topic[(scope, core)]
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "topics": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "avgLookupMs": self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0,
+                "threshold": self.threshold,
+            }
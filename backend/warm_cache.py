@@ -0,0 +1,140 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Plan data precomputed for popular topics by precompute.py (empty disables the warm tier)
+WARM_CACHE_FILE = os.getenv("WARM_CACHE_FILE", "")
+
+MAGIC = b"LFWARM01"
+HEADER = struct.Struct("<8sId")  # magic, record count, creation time
+RECORD = struct.Struct("<32sQId")  # key digest, value offset, value length, expiry time
+
+
+def write_warm_file(path: str, entries: Iterable[Tuple[Sequence[str], Dict[str, Any], float]]) -> int:
+    """Write (cache keys, plan data, expiry time) entries to a warm cache file.
+
+    Records are sorted by key so readers can binary search them in place; values are
+    compact JSON stored once however many keys point at them. The file is replaced
+    atomically, so workers that mapped the previous one keep reading it. Returns the
+    number of records.
+    """
+    entries = list(entries)
+    records: Dict[bytes, int] = {}
+    for index, (keys, _, _) in enumerate(entries):
+        for key in keys:
+            records[bytes.fromhex(key)] = index  # later entries win
+    offsets: Dict[int, Tuple[int, int]] = {}
+    values = bytearray()
+    for index in sorted(set(records.values())):
+        value = json.dumps(entries[index][1], separators=(",", ":")).encode("utf-8")
+        offsets[index] = (len(values), len(value))
+        values += value
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), time.time()))
+        for digest in sorted(records):
+            index = records[digest]
+            f.write(RECORD.pack(digest, *offsets[index], entries[index][2]))
+        f.write(values)
+    os.replace(temporary, path)
+    return len(records)
+
+
+class WarmCache:
+    """Read-only plan data for popular topics, memory-mapped from a file written by
+    precompute.py.
+
+    Mapping the file costs no parsing and its pages are shared by every worker through
+    the OS page cache; an entry is only decoded when it is hit.
+    """
+
+    def __init__(self, path: str = WARM_CACHE_FILE):
+        self.path = path
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        self._data_start = 0
+        self.created_at = 0.0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def connect(self) -> None:
+        """Map the file; a missing or invalid file leaves the warm tier empty"""
+        if self._map is not None or not self.path:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Warm cache file {self.path} not loaded: {e}")
+            return
+        if len(mapped) < HEADER.size:
+            magic, count, created_at = b"", 0, 0.0
+        else:
+            magic, count, created_at = HEADER.unpack_from(mapped)
+        if magic != MAGIC or len(mapped) < HEADER.size + count * RECORD.size:
+            logger.warning(f"Warm cache file {self.path} is not a valid warm cache, ignoring it")
+            mapped.close()
+            return
+        self._map = mapped
+        self._count = count
+        self._data_start = HEADER.size + count * RECORD.size
+        self.created_at = created_at
+        logger.info(f"Mapped {count} warm cache entries from {self.path}")
+
+    def get(self, key: str, stale_for: float = 0.0) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Plan data stored under key and its expiry time, or None.
+
+        Entries that expired less than stale_for seconds ago are returned too.
+        """
+        if self._map is None:
+            return None
+        digest = bytes.fromhex(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = HEADER.size + middle * RECORD.size
+            probe = self._map[start:start + 32]
+            if probe < digest:
+                low = middle + 1
+            elif probe > digest:
+                high = middle
+            else:
+                _, offset, length, expires_at = RECORD.unpack_from(self._map, start)
+                now = time.time()
+                if expires_at > now:
+                    self.hits += 1
+                elif expires_at + stale_for > now:
+                    self.stale_hits += 1
+                else:
+                    break
+                begin = self._data_start + offset
+                return json.loads(self._map[begin:begin + length]), expires_at
+        self.misses += 1
+        return None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self._count,
+            "bytes": len(self._map) if self._map is not None else 0,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "createdAt": self.created_at,
+            "enabled": self._map is not None,
+        }
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
@@ -31,6 +31,7 @@ export interface Resource {
   completed: boolean;
   dueDate?: string;
   rating?: number; // 1-5 rating after completion
+  catalogId?: string; // shared resource catalog entry (by normalized URL)
 }
 
 export interface Milestone {